@@ -0,0 +1,183 @@
+import functools
+import math
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+from solver import create_solver, stats
+from wordhoard import WordHoard
+from wordle import Wordle
+
+PHASES = ["load", "construction", "reset", "guess", "update", "feedback"]
+# the phases that make up a turn
+TURN_PHASES = ["guess", "update", "feedback"]
+PERCENTILES = [50, 95, 99]
+
+
+def percentile(values, p):
+    """Return the p-th percentile of some values, by the nearest-rank method
+    >>> percentile([5, 1, 4, 2, 3], 50)
+    3
+    >>> percentile(list(range(1, 101)), 95)
+    95
+    >>> percentile([7], 99)
+    7
+    >>> percentile([], 50) is None
+    True
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def peak_rss_mb():
+    """Return the peak resident set size of this process in megabytes, or None if we can't tell"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class PhaseTimer:
+    """
+    Wall-clock time spent in each phase of solving, and per turn.
+    Nested phases (a guess that asks for feedback, say) count towards both phases,
+    but only once towards the turn.
+    >>> timer = PhaseTimer()
+    >>> with timer.phase("guess"):
+    ...     pass
+    >>> timer.end_turn()
+    >>> timer.calls["guess"], len(timer.turns)
+    (1, 1)
+    """
+
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.turns = []
+        self.turn_time = 0.0
+        self.depth = 0
+
+    @contextmanager
+    def phase(self, name):
+        self.depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.depth -= 1
+            self.totals[name] += elapsed
+            self.calls[name] += 1
+            if self.depth == 0 and name in TURN_PHASES:
+                self.turn_time += elapsed
+
+    def wrap(self, name, method):
+        """Return the method timed as the named phase"""
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            with self.phase(name):
+                return method(*args, **kwargs)
+
+        return timed
+
+    def end_turn(self):
+        self.turns.append(self.turn_time)
+        self.turn_time = 0.0
+
+    def report(self):
+        phases = {}
+        for name in PHASES:
+            calls = self.calls[name]
+            phases[name] = {
+                "calls": calls,
+                "total_seconds": self.totals[name],
+                "mean_ms": 1000 * self.totals[name] / calls if calls else None,
+            }
+        latencies = [1000 * t for t in self.turns]
+        turn_latency = {f"p{p}": percentile(latencies, p) for p in PERCENTILES}
+        turn_latency["max"] = max(latencies, default=None)
+        return {"phases": phases, "turn_latency_ms": turn_latency}
+
+
+def instrument(solver, timer):
+    """Time a solver's guesses and updates as phases of the timer"""
+    solver.guess = timer.wrap("guess", solver.guess)
+    update = timer.wrap("update", solver.update)
+
+    def update_and_end_turn(guess, feedback):
+        update(guess, feedback)
+        timer.end_turn()
+
+    solver.update = update_and_end_turn
+    return solver
+
+
+def run_benchmark(solver_name, puzzles, opts, guesses=[]):
+    """
+    Solve every puzzle with the named solver, timing each phase, and return a report:
+    per-phase totals, per-turn latency percentiles, guesses per second, peak RSS and
+    the usual stats() summary. As in solve_games, one solver is built and reset between games.
+    """
+    timer = PhaseTimer()
+    start_time = time.time()
+    with timer.phase("load"):
+        wordhoard = WordHoard(file=opts.words, feedback_budget=getattr(opts, "feedback_budget", None))
+        wordhoard.feedback_matrix()
+        if getattr(opts, "book", None) and isinstance(opts.book, str):
+            from opening_book import OpeningBook
+
+            opts.book = OpeningBook.load(opts.book)
+            opts.book.check(solver_name, wordhoard, opts)
+
+    solutions = []
+    play_time = time.perf_counter()
+    solver = None
+    for puzzle in puzzles:
+        wordle = Wordle(target=puzzle, wordhoard=wordhoard)
+        wordle.feedback = timer.wrap("feedback", wordle.feedback)
+        if solver is None:
+            with timer.phase("construction"):
+                solver = create_solver(solver_name, wordle, wordhoard, opts)
+            instrument(solver, timer)
+        else:
+            with timer.phase("reset"):
+                solver.reset(wordle)
+        solutions.append(solver.solve(guesses=guesses))
+    # building the solver (a decision tree search, say) isn't play
+    play_time = time.perf_counter() - play_time - timer.totals["construction"]
+
+    report = {
+        "solver": solver_name,
+        "words": opts.words or "default",
+        "mode": opts.mode,
+        "top_n": opts.top_n,
+        "number_turns": len(timer.turns),
+    }
+    report.update(timer.report())
+    report["play_seconds"] = play_time
+    report["guesses_per_second"] = len(timer.turns) / play_time if play_time > 0 else None
+    report["peak_rss_mb"] = peak_rss_mb()
+    matrix = wordhoard.feedback_matrix()
+    if matrix is not None and not matrix.dense:
+        report["feedback_tiles"] = matrix.stats()
+    report.update(stats(solutions, start_time))
+    return report
+
+
+if __name__ == "__main__":
+    import doctest
+
+    print("Testing...")
+    doctest.testmod()
+    print("Done.")
@@ -0,0 +1,164 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmark import run_benchmark
+from globals import FREQ_FILE, SOLUTION_FILE
+from sweep import solver_options
+from wordhoard import WordHoard
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+SOLVERS = ["frequency", "random", "ir", "norvig", "worst"]
+
+# name: (word list, puzzle file, or None to play random targets drawn from the word list)
+WORKLOADS = {
+    "puzzles": (FREQ_FILE, SOLUTION_FILE),
+    "irish": (os.path.join(DATA, "irish-5words.txt"), os.path.join(DATA, "irish-puzzles.txt")),
+    "nytimes-random": (FREQ_FILE, None),
+    "spanish-random": (os.path.join(DATA, "spanish-5words+freqs.tsv"), None),
+    "5words-random": (os.path.join(DATA, "5words+frequencies.tsv"), None),
+}
+
+# what a case is compared on, and whether more is better
+THROUGHPUT = {"games_per_second": True, "ms_per_guess": False}
+
+
+def workload_puzzles(workload, games, seed):
+    """
+    Return the puzzles for a workload: the first games from its puzzle file, or games random
+    targets drawn from its word list with the seed, so every run plays the same games
+    """
+    words, puzzles = WORKLOADS[workload]
+    if puzzles is not None:
+        with open(puzzles) as f:
+            return [puzzle.strip() for puzzle in f if puzzle.strip()][:games]
+    word_list = WordHoard(words).word_list
+    # a generator of its own, so the targets aren't the random solver's guesses
+    return random.Random(f"targets:{seed}").sample(word_list, min(games, len(word_list)))
+
+
+def run_case(solver, workload, puzzles, opts, seed):
+    """Benchmark one solver on one workload; meant to run in a fresh process, so peak RSS is its own"""
+    random.seed(seed)
+    opts.words = WORKLOADS[workload][0]
+    try:
+        report = run_benchmark(solver, puzzles, opts)
+    except (AssertionError, ValueError) as e:
+        return {"solver": solver, "workload": workload, "error": f"{e.__class__.__name__}: {e}"}
+    return {
+        "solver": solver,
+        "workload": workload,
+        "number_played": report["number_played"],
+        "failure_rate": report["failure_rate"],
+        "average_guesses": report["average_guesses"],
+        "max_guesses": report["max_guesses"],
+        "games_per_second": report["number_played"] / report["play_seconds"] if report["play_seconds"] else None,
+        "ms_per_guess": report["phases"]["guess"]["mean_ms"],
+        "turn_latency_ms": report["turn_latency_ms"],
+        "load_seconds": report["phases"]["load"]["total_seconds"],
+        "peak_rss_mb": report["peak_rss_mb"],
+    }
+
+
+def run_suite(solvers, workloads, games=100, seed=2022, mode="easy", top_n=4500):
+    """Benchmark every solver on every workload, yielding each case's results as it finishes"""
+    for workload in workloads:
+        puzzles = workload_puzzles(workload, games, seed)
+        for solver in solvers:
+            opts = solver_options(solver, mode, top_n)
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                yield pool.submit(run_case, solver, workload, puzzles, opts, seed).result()
+
+
+def compare(results, baseline, threshold=0.1):
+    """
+    Return a description of each case whose throughput is more than threshold (a fraction)
+    worse than in the baseline
+    >>> baseline = [{"solver": "ir", "workload": "puzzles", "games_per_second": 10.0, "ms_per_guess": 50.0}]
+    >>> compare([{"solver": "ir", "workload": "puzzles", "games_per_second": 9.5, "ms_per_guess": 52.0}], baseline)
+    []
+    >>> compare([{"solver": "ir", "workload": "puzzles", "games_per_second": 8.0, "ms_per_guess": 52.0}], baseline)
+    ['ir on puzzles: games_per_second 8.00 vs 10.00 (-20.0%)']
+    """
+    before = {(case["solver"], case["workload"]): case for case in baseline}
+    regressions = []
+    for case in results:
+        old = before.get((case["solver"], case["workload"]))
+        if old is None or "error" in case or "error" in old:
+            continue
+        for metric, higher_is_better in THROUGHPUT.items():
+            new_value, old_value = case.get(metric), old.get(metric)
+            if not new_value or not old_value:
+                continue
+            change = (new_value - old_value) / old_value
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append(
+                    f"{case['solver']} on {case['workload']}: {metric} {new_value:.2f} vs {old_value:.2f} ({change:+.1%})"
+                )
+    return regressions
+
+
+if __name__ == "__main__":
+    example_text = """examples:
+
+     python benchmark_suite.py -o baseline.json
+     python benchmark_suite.py -s ir,worst -l puzzles -b baseline.json -t 0.05"""
+
+    parser = argparse.ArgumentParser(
+        epilog=example_text,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description="Benchmark solvers across word lists, optionally failing on a throughput regression",
+    )
+    parser.add_argument("-s", "--solvers", help="Comma-separated solvers", default=",".join(SOLVERS))
+    parser.add_argument("-l", "--workloads", help="Comma-separated workloads", default=",".join(WORKLOADS))
+    parser.add_argument("-g", "--games", help="Games per case", default=100, type=int)
+    parser.add_argument("-r", "--seed", help="Seed for random targets and the random solver", default=2022, type=int)
+    parser.add_argument("-m", "--mode", help="Mode (hard/easy)", default="easy")
+    parser.add_argument("-n", "--top_n", help="Top N words to use", default=4500, type=int)
+    parser.add_argument("-o", "--output", help="Results file to write", default="benchmark_results.json")
+    parser.add_argument("-b", "--baseline", help="Results file to compare against", default=None)
+    parser.add_argument("-t", "--threshold", help="Fractional throughput loss that counts as a regression", default=0.1, type=float)
+    args = parser.parse_args()
+
+    solvers = args.solvers.split(",")
+    workloads = args.workloads.split(",")
+    for solver in solvers:
+        if solver not in SOLVERS:
+            raise ValueError(f"Unknown solver: {solver}")
+    for workload in workloads:
+        if workload not in WORKLOADS:
+            raise ValueError(f"Unknown workload: {workload}")
+
+    start_time = time.time()
+    results = []
+    for case in run_suite(solvers, workloads, args.games, args.seed, args.mode, args.top_n):
+        results.append(case)
+        if "error" in case:
+            print(f"{case['solver']:>9} {case['workload']:<15} {case['error']}")
+        else:
+            print(
+                f"{case['solver']:>9} {case['workload']:<15} {case['games_per_second']:8.2f} games/s"
+                f" {case['ms_per_guess']:8.2f} ms/guess {case['peak_rss_mb']:7.1f} MB"
+                f"  failure rate {case['failure_rate']:.2%}, {case['average_guesses']:.3f} guesses"
+            )
+    with open(args.output, "w") as f:
+        json.dump(
+            {"seed": args.seed, "games": args.games, "mode": args.mode, "top_n": args.top_n, "results": results},
+            f,
+            indent=1,
+        )
+    print(f"Wrote {len(results)} cases to {args.output} in {time.time() - start_time:.2f} seconds")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
@@ -1,42 +1,45 @@
-from solver import *
-from wordhoard import *
-from wordle import *
-from datetime import datetime
+import argparse
+import os
+
 from rich.progress import Progress
 
-wordhoard = WordHoard()
-words = sorted(wordhoard.words_with_frequency(1000000))
+from globals import SOLUTION_FILE
+from sweep import checkpoint_metadata, read_checkpoint, solver_options, sweep, write_results
+from wordhoard import WordHoard
 
-puzzles = [puzzle.strip() for puzzle in open(SOLUTION_FILE).read().splitlines()]
-# puzzles = puzzles[:10]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find the best first word by playing every puzzle with it")
+    parser.add_argument("-w", "--words", help="Supplied Words", default=None)
+    parser.add_argument("-p", "--puzzles", help="Puzzle file", default=SOLUTION_FILE)
+    parser.add_argument("-f", "--frequency", help="Only try words at least this frequent", default=1000000, type=int)
+    parser.add_argument("-s", "--solver", help="Solver class to play on after the first word", default="frequency")
+    parser.add_argument("-m", "--mode", help="Mode (hard/easy)", default="easy")
+    parser.add_argument("-n", "--top_n", help="Top N words to use", default=4500, type=int)
+    parser.add_argument("-j", "--jobs", help="Worker processes", default=os.cpu_count(), type=int)
+    parser.add_argument("-o", "--output", help="Consolidated results file", default="best_first_words.json")
+    parser.add_argument("-c", "--checkpoint", help="Checkpoint file to resume from (default: OUTPUT.ndjson)", default=None)
+    args = parser.parse_args()
 
-with Progress() as progress:
-    task = progress.add_task("Investigating...", total=len(words))
-    estimated_seconds = len(words) * 30  # 30 seconds per word
-    progress.console.print(
-        f"[bold red]{len(words)}[/bold red] words to investigate over [bold red]{len(puzzles)}[/bold red] puzzles"
-    )
-    progress.console.print(
-        f"[bold red]{estimated_seconds/3600.0:.4}[/bold red] hours to finish (around {datetime.fromtimestamp(time.time() + estimated_seconds)})"
-    )
-    for word in words:
-        progress.console.print(f"Working on word {word}")
-        start_time = time.time()
-        solutions = []
-        for puzzle in puzzles:
-            solutions.append(
-                Solver(
-                    Wordle(size=5, target=puzzle.strip(), wordhoard=wordhoard),
-                    verbose=False,
-                    wordhoard=wordhoard,
-                ).solve(guesses=[word])
-            )
-        statistics = stats(solutions, start_time, include_solutions=False)
-        statistics["first_guess"] = word
-        with open(f"/tmp/{word}.json", "w") as f:
-            f.write(json.dumps(statistics))
+    checkpoint = args.checkpoint or args.output + ".ndjson"
+    wordhoard = WordHoard(args.words)
+    words = sorted(wordhoard.words_with_frequency(args.frequency))
+    puzzles = [puzzle.strip() for puzzle in open(args.puzzles).read().splitlines() if puzzle.strip()]
+
+    opts = solver_options(args.solver, args.mode, args.top_n)
+    results = list(read_checkpoint(checkpoint, checkpoint_metadata(puzzles, wordhoard, opts)).values())
+    with Progress() as progress:
+        task = progress.add_task("Investigating...", total=len(words), completed=len(results))
         progress.console.print(
-            f"{word} failure rate: {statistics['failure_rate']:.2%} after {statistics['elapsed_time']:.2f} seconds"
+            f"[bold red]{len(words) - len(results)}[/bold red] words to investigate over [bold red]{len(puzzles)}[/bold red] puzzles"
+            f" with {args.jobs} workers"
         )
-        progress.advance(task)
-exit(0)
+        for statistics in sweep(words, puzzles, args.words, opts, args.jobs, checkpoint):
+            results.append(statistics)
+            progress.console.print(
+                f"{statistics['first_guess']} failure rate: {statistics['failure_rate']:.2%} after {statistics['elapsed_time']:.2f} seconds"
+            )
+            progress.advance(task)
+    ranked = write_results(args.output, results)
+    if ranked:
+        best = ranked[0]
+        print(f"Best first word: {best['first_guess']} (failure rate {best['failure_rate']:.2%}, {best['average_guesses']:.3f} guesses)")
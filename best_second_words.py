@@ -1,42 +1,52 @@
-from solver import *
-from wordhoard import *
-from wordle import *
-from datetime import datetime
-from rich.progress import Progress
+import argparse
+import time
 
-wordhoard = WordHoard()
-words = sorted(wordhoard.words_with_frequency(1000000))
+from feedback import cache_key, decode_feedback
+from opening_book import OpeningBook
+from two_ply import METRICS, best_pairs, best_second_guesses
+from wordhoard import WordHoard
 
-puzzles = [puzzle.strip() for puzzle in open(SOLUTION_FILE).read().splitlines()]
-# puzzles = puzzles[:10]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search for the best pair of opening guesses, and the best second guess after an opener")
+    parser.add_argument("-w", "--words", help="Supplied Words", default=None)
+    parser.add_argument("-n", "--top_n", help="Top N words to use as answers", default=4500, type=int)
+    parser.add_argument("-a", "--all-guesses", help="Guess from the whole word list, not just the answers", default=False, action="store_true")
+    parser.add_argument("-M", "--metric", help=f"Score pairs by ({', '.join(METRICS)})", default="entropy")
+    parser.add_argument("-t", "--top", help="How many pairs to report", default=10, type=int)
+    parser.add_argument("-g", "--first", help="Opener to build the book for (default: first word of the best pair)", default=None)
+    parser.add_argument("-o", "--output", help="Opening book file to write", default="opening_book.json")
+    args = parser.parse_args()
+    if args.metric not in METRICS:
+        raise ValueError(f"Unknown metric: {args.metric}")
 
-with Progress() as progress:
-    task = progress.add_task("Investigating...", total=len(words))
-    estimated_seconds = len(words) * 30  # 30 seconds per word
-    progress.console.print(
-        f"[bold red]{len(words)}[/bold red] words to investigate over [bold red]{len(puzzles)}[/bold red] puzzles"
-    )
-    progress.console.print(
-        f"[bold red]{estimated_seconds/3600.0:.4}[/bold red] hours to finish (around {datetime.fromtimestamp(time.time() + estimated_seconds)})"
+    wordhoard = WordHoard(args.words)
+    matrix = wordhoard.feedback_matrix()
+    if matrix is None:
+        raise ValueError("The pair search needs a feedback matrix, and the words in this list aren't all the same size")
+    answers = matrix.indices(wordhoard.most_frequent_words(args.top_n))
+    guesses = matrix.indices(wordhoard.word_list) if args.all_guesses else answers
+
+    start_time = time.time()
+    pairs, scored = best_pairs(matrix, guesses, answers, args.metric, args.top)
+    total = len(guesses) * (len(guesses) - 1) // 2
+    print(f"Scored {scored} of {total} pairs ({scored / max(total, 1):.2%}) in {time.time() - start_time:.2f} seconds")
+    for score, first, second in pairs:
+        print(f"{matrix.words[first]} {matrix.words[second]}\t{score:.4f}")
+
+    first = args.first or matrix.words[pairs[0][1]]
+    seconds = best_second_guesses(matrix, matrix.index[first], guesses, answers)
+    book = OpeningBook(
+        metadata={
+            "words": args.words or "default",
+            "word_list_key": cache_key(matrix.words).hex(),
+            "top_n": args.top_n,
+            "mode": "easy",
+            "all_guesses": args.all_guesses,
+            "metric": args.metric,
+        }
     )
-    for word in words:
-        progress.console.print(f"Working on word {word}")
-        start_time = time.time()
-        solutions = []
-        for puzzle in puzzles:
-            solutions.append(
-                Solver(
-                    Wordle(size=5, target=puzzle.strip(), wordhoard=wordhoard),
-                    verbose=False,
-                    wordhoard=wordhoard,
-                ).solve(guesses=[word])
-            )
-        statistics = stats(solutions, start_time, include_solutions=False)
-        statistics["first_guess"] = word
-        with open(f"/tmp/{word}.json", "w") as f:
-            f.write(json.dumps(statistics))
-        progress.console.print(
-            f"{word} failure rate: {statistics['failure_rate']:.2%} after {statistics['elapsed_time']:.2f} seconds"
-        )
-        progress.advance(task)
-exit(0)
+    book.add([], [], first)
+    for code, second in seconds.items():
+        book.add([first], [decode_feedback(code, matrix.size)], matrix.words[second])
+    book.save(args.output)
+    print(f"Wrote {len(book)} moves after {first} to {args.output}")
@@ -1,61 +1,111 @@
+def popcount(n):
+    """Return the number of set bits in a non-negative int
+    >>> popcount(0b1011)
+    3
+    """
+    return n.bit_count() if hasattr(n, "bit_count") else bin(n).count("1")
+
+
 class BitSet:
-    def __init__(self, size):
+    """
+    A fixed-size set of bits backed by a single Python int, so every operation is one C-level operation
+    >>> b = BitSet.from_indices(10, [1, 3, 5])
+    >>> b.count()
+    3
+    >>> list(b.iter_set_bits())
+    [1, 3, 5]
+    >>> (b & BitSet.from_indices(10, [3, 4])).to_indices()
+    [3]
+    >>> (~b).count()
+    7
+    >>> str(b)
+    '0101010000'
+    >>> b[3], 4 in b
+    (True, False)
+    """
+
+    __slots__ = ("size", "bits")
+
+    def __init__(self, size, bits=0):
         self.size = size
-        self.bitset = [0] * (size // 32 + 1)
+        self.bits = bits
+
+    @classmethod
+    def from_indices(cls, size, indices):
+        buffer = bytearray(size // 8 + 1)
+        for index in indices:
+            index = int(index)
+            buffer[index >> 3] |= 1 << (index & 7)
+        return cls(size, int.from_bytes(buffer, "little"))
+
+    @classmethod
+    def full(cls, size):
+        return cls(size, (1 << size) - 1)
+
+    def _mask(self):
+        return (1 << self.size) - 1
 
     def __getitem__(self, index):
-        return self.bitset[index // 32] & (1 << (index % 32)) != 0
+        return (self.bits >> index) & 1 == 1
 
     def __setitem__(self, index, value):
         if value:
-            self.bitset[index // 32] |= 1 << (index % 32)
+            self.bits |= 1 << index
         else:
-            self.bitset[index // 32] &= ~(1 << (index % 32))
+            self.bits &= ~(1 << index)
 
     def __str__(self):
-        return ''.join(str(int(self[i])) for i in range(self.size))
+        return "".join("1" if self[i] else "0" for i in range(self.size))
 
     def __repr__(self):
         return f"BitSet({self.size})"
 
     def __eq__(self, other):
-        return self.bitset == other.bitset
+        return self.bits == other.bits
 
     def __hash__(self):
-        return hash(tuple(self.bitset))
+        return hash(self.bits)
 
     def __len__(self):
         return self.size
 
     def __bool__(self):
-        return any(self.bitset)
+        return self.bits != 0
+
+    def count(self):
+        """Return the number of bits set"""
+        return popcount(self.bits)
 
     def __invert__(self):
-        result = BitSet(self.size)
-        for i in range(len(self.bitset)):
-            result.bitset[i] = ~self.bitset[i]
-        return result
+        return BitSet(self.size, ~self.bits & self._mask())
 
     def __and__(self, other):
-        result = BitSet(self.size)
-        for i in range(len(self.bitset)):
-            result.bitset[i] = self.bitset[i] & other.bitset[i]
-        return result
+        return BitSet(self.size, self.bits & other.bits)
 
     def __or__(self, other):
-        result = BitSet(self.size)
-        for i in range(len(self.bitset)):
-            result.bitset[i] = self.bitset[i] | other.bitset[i]
-        return result
+        return BitSet(self.size, self.bits | other.bits)
 
-    def __invert__(self):
-        result = BitSet(self.size)
-        for i in range(len(self.bitset)):
-            result.bitset[i] = ~self.bitset[i]
-        return result
+    def __xor__(self, other):
+        return BitSet(self.size, self.bits ^ other.bits)
+
+    def __iand__(self, other):
+        self.bits &= other.bits
+        return self
+
+    def __ior__(self, other):
+        self.bits |= other.bits
+        return self
+
+    def __ixor__(self, other):
+        self.bits ^= other.bits
+        return self
+
+    def __isub__(self, other):
+        self.bits &= ~other.bits
+        return self
 
     def __sub__(self, other):
-        return self & ~other
+        return BitSet(self.size, self.bits & ~other.bits)
 
     def __add__(self, other):
         return self | other
@@ -70,7 +120,24 @@ class BitSet:
         for i in range(self.size):
             yield self[i]
 
+    def iter_set_bits(self):
+        """Yield the indices of the set bits, in order, skipping the unset ones"""
+        for i, byte in enumerate(self.bits.to_bytes(self.size // 8 + 1, "little")):
+            while byte:
+                low = byte & -byte
+                yield (i << 3) + low.bit_length() - 1
+                byte ^= low
+
+    def to_indices(self):
+        return list(self.iter_set_bits())
+
     def copy(self):
-        result = BitSet(self.size)
-        result.bitset = self.bitset.copy()
-        return result
+        return BitSet(self.size, self.bits)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    print("Testing...")
+    doctest.testmod()
+    print("Done.")
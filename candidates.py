@@ -0,0 +1,178 @@
+import numpy as np
+
+from bitset import BitSet
+from feedback import encode_feedback, feedback_code
+from wordle_knowledge import WordleKnowledge
+
+
+class CandidateSet:
+    """
+    A set of words from a WordHoard, held as a boolean mask over its word list
+    >>> from wordhoard import WordHoard
+    >>> wh = WordHoard()
+    >>> c = CandidateSet.from_words(wh, ["knoll", "blood", "audio", "zzzzz"])
+    >>> len(c)
+    3
+    >>> c.words()
+    ['audio', 'blood', 'knoll']
+    >>> c.after_feedback("lulls", "y··g·").words()
+    ['knoll']
+    >>> "audio" in c, "radio" in c
+    (True, False)
+    """
+
+    def __init__(self, wordhoard, mask, indices=None):
+        self.wordhoard = wordhoard
+        self.mask = mask
+        # the indices of the mask's words, when we already have them
+        self._indices = indices
+
+    @classmethod
+    def from_words(cls, wordhoard, words):
+        """Make a candidate set from some words, ignoring any the word hoard doesn't know"""
+        mask = np.zeros(len(wordhoard.word_list), dtype=bool)
+        indices = [wordhoard.word_index[word] for word in words if word in wordhoard.word_index]
+        mask[indices] = True
+        return cls(wordhoard, mask)
+
+    @classmethod
+    def from_indices(cls, wordhoard, indices):
+        """Make a candidate set from word hoard indices, in increasing order"""
+        indices = np.asarray(indices, dtype=np.int64)
+        mask = np.zeros(len(wordhoard.word_list), dtype=bool)
+        mask[indices] = True
+        return cls(wordhoard, mask, indices)
+
+    @classmethod
+    def all_words(cls, wordhoard):
+        return cls(wordhoard, wordhoard.lexicon().all_mask())
+
+    @classmethod
+    def top(cls, wordhoard, n):
+        """Make a candidate set of the n most frequent words, sharing the word hoard's mask"""
+        return cls(wordhoard, wordhoard.lexicon().top_mask(n))
+
+    def indices(self):
+        """Return the word hoard indices of the candidates, in order"""
+        if self._indices is None:
+            self._indices = np.flatnonzero(self.mask)
+        return self._indices
+
+    def words(self):
+        word_list = self.wordhoard.word_list
+        return [word_list[i] for i in self.indices()]
+
+    def __len__(self):
+        if self._indices is not None:
+            return len(self._indices)
+        return int(np.count_nonzero(self.mask))
+
+    def __bool__(self):
+        return bool(self.mask.any())
+
+    def __iter__(self):
+        return iter(self.words())
+
+    def __contains__(self, word):
+        index = self.wordhoard.word_index.get(word)
+        return index is not None and bool(self.mask[index])
+
+    def __or__(self, other):
+        return CandidateSet(self.wordhoard, self.mask | other.mask)
+
+    def __and__(self, other):
+        return CandidateSet(self.wordhoard, self.mask & other.mask)
+
+    def __eq__(self, other):
+        return isinstance(other, CandidateSet) and np.array_equal(self.mask, other.mask)
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def key(self):
+        """Return a compact, hashable key for the set"""
+        return np.packbits(self.mask).tobytes()
+
+    def bitset(self):
+        """Return the set as a BitSet over the word list
+        >>> from wordhoard import WordHoard
+        >>> wh = WordHoard()
+        >>> c = CandidateSet.from_words(wh, ["knoll", "blood"])
+        >>> c.bitset().count()
+        2
+        >>> CandidateSet.from_bitset(wh, c.bitset()) == c
+        True
+        """
+        packed = np.packbits(self.mask, bitorder="little")
+        return BitSet(len(self.mask), int.from_bytes(packed.tobytes(), "little"))
+
+    @classmethod
+    def from_bitset(cls, wordhoard, bitset):
+        size = len(wordhoard.word_list)
+        packed = np.frombuffer(bitset.bits.to_bytes(size // 8 + 1, "little"), dtype=np.uint8)
+        return cls(wordhoard, np.unpackbits(packed, bitorder="little")[:size].astype(bool))
+
+    def position_counts(self):
+        """Return a (positions x alphabet) array of letter counts at each position over the candidates
+        (the alphabet being the word hoard's lexicon's)"""
+        return self.wordhoard.lexicon().position_counts(self.mask)
+
+    def most_frequent(self):
+        """Return the most frequent candidate, or None if there are none
+        >>> from wordhoard import WordHoard
+        >>> CandidateSet.from_words(WordHoard(), ["every", "audio"]).most_frequent()
+        'every'
+        """
+        index = self.wordhoard.lexicon().most_frequent(self.mask)
+        return None if index is None else self.wordhoard.word_list[index]
+
+    def copy(self):
+        return CandidateSet(self.wordhoard, self.mask.copy())
+
+    def discard(self, word):
+        """Return the set without a word"""
+        index = self.wordhoard.word_index.get(word)
+        if index is None or not self.mask[index]:
+            return self
+        result = self.copy()
+        result.mask[index] = False
+        if self._indices is not None:
+            result._indices = self._indices[self._indices != index]
+        return result
+
+    def after_feedback(self, guess, feedback):
+        """
+        Return the candidates that would have given this feedback for the guess. Only the
+        current candidates are checked, against the guess's feedback matrix row if we have it:
+        they already agree with every earlier guess. A guess with no row (one that isn't in
+        the word list) goes through the letter indices of WordleKnowledge instead.
+        >>> from wordhoard import WordHoard
+        >>> c = CandidateSet.top(WordHoard(), 4500)
+        >>> after = c.after_feedback("lulls", "y··g·")
+        >>> len(c), len(after), len(after.after_feedback("atoll", "··ggg"))
+        (4500, 14, 2)
+        >>> after.after_feedback("xtoll", "··ggg").words()  # not a word
+        ['droll', 'knoll']
+        """
+        code = encode_feedback(feedback)
+        indices = self.indices()
+        matrix = self.wordhoard.feedback_matrix()
+        if matrix is not None and guess in matrix:
+            survivors = indices[matrix.row(guess)[indices] == code]
+        elif self.wordhoard.lexicon().size == len(guess):
+            knowledge = WordleKnowledge.of_words(self.wordhoard)
+            knowledge.update(guess, feedback)
+            consistent = CandidateSet.from_bitset(self.wordhoard, knowledge.consistent).mask
+            survivors = indices[consistent[indices]]
+        else:
+            word_list = self.wordhoard.word_list
+            survivors = indices[[feedback_code(guess, word_list[i]) == code for i in indices]]
+        return CandidateSet.from_indices(self.wordhoard, survivors)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    print("Testing...")
+    doctest.testmod()
+    print("Done.")
@@ -0,0 +1,231 @@
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+from candidates import CandidateSet
+from feedback import cache_key, decode_feedback, guess_entropies, number_of_codes
+from files import atomic_write
+from solver import Solver
+
+OBJECTIVES = ["expected", "worst"]
+
+# Trees already built in this process, by what they were built for
+_trees = {}
+
+
+def lower_bound(n, objective="expected", codes=243):
+    """
+    A lower bound on the cost of finishing a set of n answers: the total number of guesses
+    over all of them, or the most guesses any one needs. One guess can solve at most one
+    answer outright and split the rest into at most codes - 1 groups.
+    >>> lower_bound(1), lower_bound(2), lower_bound(300)
+    (1, 3, 656)
+    >>> lower_bound(1, "worst"), lower_bound(5, "worst")
+    (1, 2)
+    """
+    if n == 0:
+        return 0
+    if objective == "worst":
+        return 1 if n == 1 else 2
+    return 2 * n - 1 + max(0, n - codes)
+
+
+class TreeSearch:
+  """
+  Search for a decision tree over a set of answers, minimizing the total (so expected)
+  number of guesses or the worst case. At each node only the `beam` best guesses by
+  entropy are tried, sub-results are memoized on the answer set, and a guess is abandoned
+  as soon as what it has cost so far plus lower bounds for the rest can't beat the best.
+  Once the node or time budget runs out, the remaining nodes are finished greedily.
+  """
+
+  def __init__(self, matrix, guesses, objective="expected", beam=5, node_budget=2000, time_budget=None):
+    if objective not in OBJECTIVES:
+      raise ValueError(f"Unknown objective: {objective}")
+    self.matrix = matrix
+    self.guesses = np.asarray(guesses, dtype=np.int64)
+    self.objective = objective
+    self.beam = beam
+    self.node_budget = node_budget
+    self.deadline = None if time_budget is None else time.time() + time_budget
+    self.codes = number_of_codes(matrix.size)
+    self.solved = self.codes - 1
+    self.nodes = 0
+    self.memo = {}
+
+  def exhausted(self):
+    return self.nodes >= self.node_budget or (self.deadline is not None and time.time() > self.deadline)
+
+  def combine(self, n, costs):
+    if self.objective == "worst":
+      return 1 + max(costs, default=0)
+    return n + sum(costs)
+
+  def candidate_guesses(self, answers):
+    """The guesses worth trying for a set of answers, best by entropy first"""
+    beam = 1 if self.exhausted() else self.beam
+    entropies = guess_entropies(self.matrix, self.guesses, answers)
+    possible = np.isin(self.guesses, answers)
+    # ties go to guesses that could be the answer
+    order = np.lexsort((self.guesses, ~possible, -np.round(entropies, 10)))
+    return self.guesses[order[:beam]]
+
+  def partition(self, guess, answers):
+    codes = self.matrix.row_at(guess)[answers]
+    order = np.argsort(codes, kind="stable")
+    codes = codes[order]
+    answers = answers[order]
+    bounds = np.flatnonzero(np.diff(codes)) + 1
+    return list(zip(np.split(codes, bounds), np.split(answers, bounds)))
+
+  def expand(self, guess, answers, limit=math.inf):
+    """
+    Return (cost, tree) for making this guess next, or None if it learns nothing or
+    can't cost less than limit
+    """
+    parts = [(int(codes[0]), part) for codes, part in self.partition(guess, answers) if codes[0] != self.solved]
+    if len(parts) == 1 and len(parts[0][1]) == len(answers):
+      return None
+    # biggest parts first, so a losing guess is abandoned early
+    parts.sort(key=lambda p: -len(p[1]))
+    bounds = [lower_bound(len(part), self.objective, self.codes) for _, part in parts]
+    costs = []
+    children = {}
+    for i, (code, part) in enumerate(parts):
+      if self.combine(len(answers), costs + bounds[i:]) >= limit:
+        return None
+      cost, child = self.search(np.sort(part))
+      costs.append(cost)
+      children[code] = child
+    return self.combine(len(answers), costs), {"guess": guess, "next": children}
+
+  def search(self, answers):
+    """Return (cost, tree) for a sorted array of answer indices"""
+    key = answers.tobytes()
+    if key not in self.memo:
+      self.nodes += 1
+      if len(answers) == 1:
+        self.memo[key] = (1, {"guess": int(answers[0])})
+      elif len(answers) == 2:
+        # nothing beats guessing one, then the other
+        self.memo[key] = self.expand(int(answers[0]), answers)
+      else:
+        best = None
+        for guess in self.candidate_guesses(answers).tolist():
+          result = self.expand(guess, answers, best[0] if best else math.inf)
+          if result is not None:
+            best = result
+        self.memo[key] = best
+    return self.memo[key]
+
+
+def tree_to_words(tree, matrix):
+    """Return a tree with words for guesses and feedback strings for codes, for saving"""
+    result = {"guess": matrix.words[tree["guess"]]}
+    if tree.get("next"):
+        result["next"] = {decode_feedback(code, matrix.size): tree_to_words(child, matrix) for code, child in tree["next"].items()}
+    return result
+
+
+def save_tree(path, tree, metadata):
+    """Save a tree (with words for guesses) and what it was built for"""
+    atomic_write(path, lambda f: json.dump({"metadata": metadata, "tree": tree}, f), "w")
+
+
+def load_tree(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+class DecisionTreeSolver(Solver):
+  """
+  Plays a precomputed decision tree over the top_n most frequent words, guessing from the
+  whole vocabulary, so each turn is a lookup. The tree is searched for once per process (or loaded from tree_file). Its
+  guesses needn't fit the hints, so it only plays easy mode.
+  """
+
+  def __init__(
+    self,
+    wordle,
+    wordhoard=None,
+    verbose=False,
+    top_n=4500,
+    objective="expected",
+    beam=5,
+    node_budget=2000,
+    time_budget=None,
+    tree_file=None,
+  ):
+    super().__init__(wordle, wordhoard, verbose)
+    self.top_n = top_n
+    self.objective = objective
+    self.tree = self.load_or_build(beam, node_budget, time_budget, tree_file)
+    self.reset(wordle)
+
+  def reset(self, wordle):
+    super().reset(wordle)
+    self.candidates = CandidateSet.top(self.wordhoard, self.top_n)
+    self.node = self.tree
+
+  def load_or_build(self, beam, node_budget, time_budget, tree_file):
+    matrix = self.wordhoard.feedback_matrix()
+    if matrix is None:
+      raise ValueError("The decision tree solver needs a feedback matrix")
+    # any word may be guessed (the solver only plays easy mode), as the ir solver does, unless
+    # rows would have to be worked out as they're needed
+    guess_pool = "all" if matrix.dense else "answers"
+    metadata = {
+      "word_list_key": cache_key(matrix.words).hex(),
+      "top_n": self.top_n,
+      "objective": self.objective,
+      "beam": beam,
+      "node_budget": node_budget,
+      "time_budget": time_budget,
+      "guess_pool": guess_pool,
+    }
+    key = tuple(sorted(metadata.items()))
+    if key not in _trees:
+      if tree_file and os.path.exists(tree_file):
+        data = load_tree(tree_file)
+        for name, value in metadata.items():
+          if data["metadata"].get(name) != value:
+            raise ValueError(f"Decision tree {tree_file} was built for {name}={data['metadata'].get(name)}, not {value}")
+        _trees[key] = data["tree"]
+      else:
+        answers = CandidateSet.top(self.wordhoard, self.top_n).indices()
+        guesses = np.arange(len(matrix.words)) if guess_pool == "all" else answers
+        search = TreeSearch(matrix, guesses, self.objective, beam, node_budget, time_budget)
+        start_time = time.time()
+        cost, tree = search.search(answers)
+        if self.verbose:
+          print(f"Decision tree: cost {cost} over {len(answers)} answers, {search.nodes} nodes, {time.time() - start_time:.2f} seconds")
+        _trees[key] = tree_to_words(tree, matrix)
+        if tree_file:
+          save_tree(tree_file, _trees[key], dict(metadata, cost=cost, nodes=search.nodes))
+    return _trees[key]
+
+  def update(self, guess, feedback):
+    super().update(guess, feedback)
+    self.candidates = self.candidates.after_feedback(guess, feedback).discard(guess)
+    if self.node is not None and self.node["guess"] == guess:
+      self.node = self.node.get("next", {}).get(feedback)
+    else:
+      self.node = None
+
+  def possible_solutions(self):
+    return self.candidates.words()
+
+  def has_solutions(self):
+    return bool(self.candidates)
+
+  def number_of_solutions(self):
+    return len(self.candidates)
+
+  def guess(self):
+    if self.node is not None:
+      return self.node["guess"]
+    # off the tree (the answer isn't one of the top_n words, or we were given other guesses)
+    return self.candidates.most_frequent()
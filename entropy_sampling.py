@@ -0,0 +1,112 @@
+import math
+import time
+
+import numpy as np
+
+from feedback import guess_entropies, number_of_codes
+
+
+def sample_entropies(codes, population, number_of_codes=243):
+    """
+    Return, for each row of a (guesses x sample) code array, an estimate of the entropy of the
+    partition the guess makes of the population the sample was drawn from (without replacement),
+    and the standard error of that estimate. The sample's own entropy runs low, by about
+    (parts - 1) / (2 n ln 2) bits (Miller and Madow), so that is added back. A sample of the whole
+    population gives the exact entropy.
+    >>> codes = np.array([[0, 0, 0, 0], [0, 1, 2, 3], [0, 0, 0, 1]], dtype=np.uint8)
+    >>> entropy, error = sample_entropies(codes, 4)
+    >>> np.round(entropy, 3).tolist(), error.tolist()
+    ([0.0, 2.0, 0.811], [0.0, 0.0, 0.0])
+    >>> entropy, error = sample_entropies(codes, 100)
+    >>> np.round(entropy, 3).tolist(), np.round(error, 3).tolist()
+    ([0.0, 2.541, 0.992], [0.0, 0.0, 0.336])
+    """
+    guesses, n = codes.shape
+    offsets = codes.astype(np.int64) + number_of_codes * np.arange(guesses)[:, None]
+    counts = np.bincount(offsets.ravel(), minlength=guesses * number_of_codes).reshape(guesses, number_of_codes)
+    p = counts / n
+    surprise = -np.log2(np.where(counts > 0, p, 1))
+    entropy = (p * surprise).sum(axis=1)
+    if n >= population:
+        return entropy, np.zeros(guesses)
+    variance = np.maximum((p * surprise**2).sum(axis=1) - entropy**2, 0)
+    error = np.sqrt(variance / n * (1 - n / population))
+    parts = (counts > 0).sum(axis=1)
+    return entropy + (parts - 1) / (2 * n * math.log(2)), error
+
+
+class EntropySampler:
+    """
+    Estimates the entropy of each guess's partition of the candidates from samples of them,
+    racing the guesses: all of them are scored on a small sample, then only those whose
+    confidence intervals still reach the leader's are scored again on a sample twice the size.
+    The race ends when one guess is left, the rest are within error bits of each other, the
+    time budget (seconds) is spent, or the sample is all of the candidates. Up to exact_below
+    candidates are scored exactly.
+    >>> from wordhoard import WordHoard
+    >>> wh = WordHoard()
+    >>> matrix = wh.feedback_matrix()
+    >>> answers = matrix.indices(wh.most_frequent_words(4500))
+    >>> guesses = matrix.indices(["tares", "raise", "jazzy", "fuzzy"])
+    >>> sampler = EntropySampler(error=0.05)
+    >>> estimates, errors = sampler.entropies(matrix, guesses, answers)
+    >>> exact = guess_entropies(matrix, guesses, answers)
+    >>> int(estimates.argmax()) == int(exact.argmax())
+    True
+    >>> bool(abs(estimates.max() - exact.max()) < 0.05), bool(errors.max() > 0)
+    (True, True)
+    """
+
+    def __init__(self, error=0.01, time_budget=None, exact_below=1000, sample_size=256, confidence=3.0, seed=0):
+        self.error = error
+        self.time_budget = time_budget
+        self.exact_below = exact_below
+        self.sample_size = sample_size
+        self.confidence = confidence
+        self.seed = seed
+
+    def key(self):
+        """What the sampler's choices depend on, for caching them"""
+        return (self.error, self.time_budget, self.exact_below, self.sample_size, self.confidence, self.seed)
+
+    def entropies(self, matrix, guesses, candidates, block=1024):
+        """
+        Return an estimate of each guess's entropy over the candidates (index arrays), and its
+        standard error (0 where it is exact). Guesses dropped from the race keep the estimate
+        and error they were dropped with.
+        """
+        guesses = np.asarray(guesses, dtype=np.int64)
+        candidates = np.asarray(candidates, dtype=np.int64)
+        if len(candidates) <= self.exact_below:
+            return guess_entropies(matrix, guesses, candidates), np.zeros(len(guesses))
+        deadline = None if self.time_budget is None else time.time() + self.time_budget
+        # the same sample for the same candidates, so games are repeatable
+        order = np.random.default_rng(self.seed).permutation(candidates)
+        estimates = np.empty(len(guesses))
+        errors = np.empty(len(guesses))
+        racing = np.arange(len(guesses))
+        n = self.sample_size
+        while True:
+            n = min(n, len(order))
+            for start in range(0, len(racing), block):
+                rows = racing[start : start + block]
+                codes = matrix.block(guesses[rows], order[:n])
+                estimates[rows], errors[rows] = sample_entropies(codes, len(order), number_of_codes(matrix.size))
+            if n == len(order):
+                break
+            margin = self.confidence * errors[racing]
+            racing = racing[estimates[racing] + margin >= (estimates[racing] - margin).max()]
+            if len(racing) == 1 or self.confidence * errors[racing].max() <= self.error:
+                break
+            if deadline is not None and time.time() > deadline:
+                break
+            n *= 2
+        return estimates, errors
+
+
+if __name__ == "__main__":
+    import doctest
+
+    print("Testing...")
+    doctest.testmod()
+    print("Done.")
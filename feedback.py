@@ -0,0 +1,482 @@
+import hashlib
+import os
+import struct
+from collections import OrderedDict
+from functools import cache
+
+import numpy as np
+
+from files import atomic_write
+
+# Feedback for a single letter, as a base-3 digit
+GREY = 0
+YELLOW = 1
+GREEN = 2
+
+SYMBOLS = "·yg"
+
+# Bump whenever the feedback rules (or the way codes are computed) change
+FEEDBACK_RULES = "green-then-yellow/base3-msb-first/1"
+
+# On-disk matrix cache: magic, format version, word size, word count, key
+CACHE_MAGIC = b"WFBM"
+CACHE_VERSION = 1
+CACHE_HEADER = struct.Struct("<4sIIQ32s")
+CACHE_SUFFIX = ".fbm"
+
+# Beyond this many words a dense guess x answer matrix gets too big to hold
+MAX_MATRIX_WORDS = 20000
+
+# How much memory the rows of a TiledFeedbackMatrix may take, by default
+FEEDBACK_BUDGET = 256 * 1024 * 1024
+
+
+def number_of_codes(size):
+    """Return the number of distinct feedback codes for a given word size
+    >>> number_of_codes(5)
+    243
+    """
+    return 3**size
+
+
+def encode_feedback(feedback):
+    """Encode a feedback string as a base-3 integer, first letter most significant
+    >>> encode_feedback('·····')
+    0
+    >>> encode_feedback('ggggg')
+    242
+    >>> encode_feedback('····y')
+    1
+    >>> encode_feedback('y····')
+    81
+    """
+    code = 0
+    for f in feedback:
+        code *= 3
+        if f == "g":
+            code += GREEN
+        elif f == "y":
+            code += YELLOW
+    return code
+
+
+def decode_feedback(code, size=5):
+    """Decode a base-3 feedback code back to a feedback string
+    >>> decode_feedback(242)
+    'ggggg'
+    >>> decode_feedback(0)
+    '·····'
+    >>> decode_feedback(encode_feedback('yggg·'))
+    'yggg·'
+    """
+    letters = []
+    for _ in range(size):
+        code, digit = divmod(int(code), 3)
+        letters.append(SYMBOLS[digit])
+    return "".join(reversed(letters))
+
+
+def feedback_code(word, target):
+    """Return the feedback code for a guess against a target
+    >>> decode_feedback(feedback_code('blood', 'knoll'))
+    '·yg··'
+    >>> decode_feedback(feedback_code('lulls', 'knoll'))
+    'y··g·'
+    >>> decode_feedback(feedback_code('ollas', 'knoll'))
+    'yyy··'
+    """
+    size = len(word)
+    digits = [GREY] * size
+    unmatched = {}
+    for i in range(size):
+        if word[i] == target[i]:
+            digits[i] = GREEN
+        else:
+            unmatched[target[i]] = unmatched.get(target[i], 0) + 1
+    for i in range(size):
+        if digits[i] != GREEN and unmatched.get(word[i], 0) > 0:
+            digits[i] = YELLOW
+            unmatched[word[i]] -= 1
+    code = 0
+    for digit in digits:
+        code = code * 3 + digit
+    return code
+
+
+def letter_array(words):
+    """Return a (words x positions) uint8 array of letters, numbered in alphabetical order
+    >>> letter_array(['abc', 'cab'])
+    array([[0, 1, 2],
+           [2, 0, 1]], dtype=uint8)
+    """
+    alphabet = {letter: i for i, letter in enumerate(sorted(set("".join(words))))}
+    size = len(words[0]) if words else 0
+    return np.array([[alphabet[c] for c in word] for word in words], dtype=np.uint8).reshape(
+        len(words), size
+    )
+
+
+def letter_counts(letters):
+    """Return a (words x alphabet) array of how often each letter occurs in each word"""
+    counts = np.zeros((len(letters), int(letters.max(initial=0)) + 1), dtype=np.uint8)
+    for i in range(letters.shape[1]):
+        np.add.at(counts, (np.arange(len(letters)), letters[:, i]), 1)
+    return counts
+
+
+def letter_positions(letters, alphabet_size=None):
+    """
+    Return an (alphabet x words) uint8 array of where each letter is in each word, as a
+    bitmask with bit i set for position i
+    >>> letter_positions(letter_array(['knoll', 'lulls']))[1].tolist()  # 'l'
+    [24, 13]
+    """
+    if alphabet_size is None:
+        alphabet_size = int(letters.max(initial=0)) + 1
+    positions = np.zeros((alphabet_size, len(letters)), dtype=np.uint8)
+    words = np.arange(len(letters))
+    for i in range(letters.shape[1]):
+        positions[letters[:, i], words] |= np.uint8(1 << i)
+    return positions
+
+
+@cache
+def letter_feedback_table(size):
+    """
+    Return a (2**size x 2**size) table of the feedback one letter contributes to a code,
+    by where it is in the guess and where it is in the target (bitmasks as letter_positions
+    makes them). Greens first, then yellows left to right while the target has copies left,
+    so the contributions of a guess's distinct letters add up to its feedback code.
+    >>> table = letter_feedback_table(5)
+    >>> decode_feedback(table[0b01101, 0b11000])  # lulls against knoll, the l's
+    'y··g·'
+    """
+    table = np.zeros((1 << size, 1 << size), dtype=np.uint8)
+    for guess_mask in range(1 << size):
+        for target_mask in range(1 << size):
+            unmatched = bin(target_mask & ~guess_mask).count("1")
+            code = 0
+            for i in range(size):
+                code *= 3
+                if guess_mask >> i & 1:
+                    if target_mask >> i & 1:
+                        code += GREEN
+                    elif unmatched > 0:
+                        code += YELLOW
+                        unmatched -= 1
+            table[guess_mask, target_mask] = code
+    table.flags.writeable = False
+    return table
+
+
+def feedback_block(guesses, targets, target_positions=None):
+    """
+    Return the (guesses x targets) feedback codes between two letter arrays, numbered by the
+    same alphabet. Each distinct letter of a guess adds its contribution, looked up by where it
+    is in the guess and in the targets; target_positions (from letter_positions) can be passed
+    in when the same targets are used again.
+    >>> letters = letter_array(['blood', 'knoll', 'lulls', 'ollas', 'sassy'])
+    >>> codes = feedback_block(letters, letters[1:2])
+    >>> [decode_feedback(c) for c in codes[:, 0]]
+    ['·yg··', 'ggggg', 'y··g·', 'yyy··', '·····']
+    >>> decode_feedback(feedback_block(letters[4:5], letters[3:4])[0, 0])  # ollas has one s
+    'yy···'
+    """
+    size = guesses.shape[1]
+    alphabet_size = int(guesses.max(initial=0)) + 1
+    if target_positions is None:
+        target_positions = letter_positions(targets, alphabet_size)
+    elif len(target_positions) < alphabet_size:
+        # letters of the guesses the targets' alphabet has never seen are in none of them
+        target_positions = np.concatenate(
+            [target_positions, np.zeros((alphabet_size - len(target_positions), len(targets)), dtype=np.uint8)]
+        )
+    table = letter_feedback_table(size).ravel()
+    codes = np.zeros((len(guesses), len(targets)), dtype=np.uint8)
+    for i in range(size):
+        letter = guesses[:, i]
+        # guesses where this is the letter's first position, and where else it is
+        first = np.ones(len(guesses), dtype=bool)
+        for j in range(i):
+            first &= guesses[:, j] != letter
+        rows = np.flatnonzero(first)
+        guess_mask = np.zeros(len(rows), dtype=np.uint16)
+        for j in range(i, size):
+            guess_mask |= (guesses[rows, j] == letter[rows]).astype(np.uint16) << j
+        index = target_positions[letter[rows]].astype(np.uint16)
+        index += (guess_mask << size)[:, None]
+        codes[rows] += table.take(index)
+    return codes
+
+
+def feedback_many(guess, targets, target_positions=None):
+    """Return the feedback codes of one guess (a row of a letter array) against each of the targets
+    >>> letters = letter_array(['blood', 'knoll', 'lulls', 'ollas'])
+    >>> [decode_feedback(c) for c in feedback_many(letters[2], letters)]
+    ['y····', 'y··g·', 'ggggg', 'y·g·g']
+    """
+    return feedback_block(np.asarray(guess, dtype=np.uint8).reshape(1, -1), targets, target_positions)[0]
+
+
+class FeedbackMatrix:
+    """
+    Every guess x answer feedback code over a word list, as a uint8 matrix
+    >>> m = FeedbackMatrix(['blood', 'knoll', 'lulls'])
+    >>> m.feedback('blood', 'knoll')
+    '·yg··'
+    >>> m.code('lulls', 'knoll') == encode_feedback('y··g·')
+    True
+    >>> m.codes.shape
+    (3, 3)
+    """
+
+    # every row is held, so scoring the whole vocabulary as guesses is cheap
+    dense = True
+
+    def __init__(self, words, codes=None):
+        self.words = list(words)
+        self.index = {word: i for i, word in enumerate(self.words)}
+        self.size = len(self.words[0]) if self.words else 0
+        if codes is None:
+            codes = self.compute(self.words)
+        self.codes = codes
+
+    @staticmethod
+    def compute(words, block=256):
+        letters = letter_array(words)
+        positions = letter_positions(letters)
+        codes = np.empty((len(words), len(words)), dtype=np.uint8)
+        for start in range(0, len(words), block):
+            codes[start : start + block] = feedback_block(letters[start : start + block], letters, positions)
+        return codes
+
+    def __contains__(self, word):
+        return word in self.index
+
+    def __len__(self):
+        return len(self.words)
+
+    def indices(self, words):
+        """Return the matrix indices of some words, as an array"""
+        return np.fromiter((self.index[word] for word in words), dtype=np.int64)
+
+    def row(self, guess):
+        """Return the feedback codes of a guess against every word"""
+        return self.codes[self.index[guess]]
+
+    def row_at(self, guess):
+        """Return the feedback codes of a guess, by index, against every word"""
+        return self.codes[guess]
+
+    def block(self, guesses, targets):
+        """Return the (guesses x targets) feedback codes between two index arrays"""
+        return self.codes[guesses][:, targets]
+
+    def code(self, guess, target):
+        return int(self.codes[self.index[guess], self.index[target]])
+
+    def feedback(self, guess, target):
+        return decode_feedback(self.code(guess, target), self.size)
+
+
+class TiledFeedbackMatrix:
+    """
+    A feedback matrix for word lists too big to hold a dense one: rows are computed a tile
+    (a few consecutive guesses) at a time when asked for, and the most recently used tiles
+    are kept, up to a memory budget in bytes. Blocks are computed directly.
+    >>> m = TiledFeedbackMatrix(['blood', 'knoll', 'lulls', 'ollas'], budget=8, tile_rows=1)
+    >>> m.feedback('blood', 'knoll'), decode_feedback(m.row('lulls')[1])
+    ('·yg··', 'y··g·')
+    >>> [decode_feedback(c) for c in m.block([3], [1, 2])[0]]
+    ['yyy··', '·yg·g']
+    >>> for word in ['lulls', 'blood', 'knoll', 'lulls']:  # room for two rows
+    ...     _ = m.row(word)
+    >>> m.stats()
+    {'tile_rows': 1, 'tiles_resident': 2, 'bytes_resident': 8, 'budget': 8, 'hits': 1, 'misses': 4, 'evictions': 2, 'hit_rate': 0.2}
+    """
+
+    dense = False
+
+    def __init__(self, words, budget=FEEDBACK_BUDGET, tile_rows=8):
+        self.words = list(words)
+        self.index = {word: i for i, word in enumerate(self.words)}
+        self.size = len(self.words[0]) if self.words else 0
+        self.letters = letter_array(self.words)
+        self.positions = letter_positions(self.letters)
+        self.budget = budget
+        self.tile_rows = tile_rows
+        self.tiles = OrderedDict()
+        self.bytes_resident = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, word):
+        return word in self.index
+
+    def __len__(self):
+        return len(self.words)
+
+    def indices(self, words):
+        """Return the matrix indices of some words, as an array"""
+        return np.fromiter((self.index[word] for word in words), dtype=np.int64)
+
+    def tile(self, number):
+        """Return a tile of rows, computing it (and making room for it) if it isn't resident"""
+        tile = self.tiles.get(number)
+        if tile is not None:
+            self.hits += 1
+            self.tiles.move_to_end(number)
+            return tile
+        self.misses += 1
+        start = number * self.tile_rows
+        tile = feedback_block(self.letters[start : start + self.tile_rows], self.letters, self.positions)
+        # always keep the tile asked for, even if it alone is over budget
+        while self.tiles and self.bytes_resident + tile.nbytes > self.budget:
+            _, evicted = self.tiles.popitem(last=False)
+            self.bytes_resident -= evicted.nbytes
+            self.evictions += 1
+        self.tiles[number] = tile
+        self.bytes_resident += tile.nbytes
+        return tile
+
+    def row(self, guess):
+        """Return the feedback codes of a guess against every word"""
+        return self.row_at(self.index[guess])
+
+    def row_at(self, guess):
+        """Return the feedback codes of a guess, by index, against every word"""
+        return self.tile(guess // self.tile_rows)[guess % self.tile_rows]
+
+    def block(self, guesses, targets):
+        """Return the (guesses x targets) feedback codes between two index arrays"""
+        targets = np.asarray(targets, dtype=np.int64)
+        return feedback_block(self.letters[guesses], self.letters[targets], self.positions[:, targets])
+
+    def code(self, guess, target):
+        return feedback_code(guess, target)
+
+    def feedback(self, guess, target):
+        return decode_feedback(self.code(guess, target), self.size)
+
+    def stats(self):
+        """Return how the tile cache is doing, to size the budget by"""
+        lookups = self.hits + self.misses
+        return {
+            "tile_rows": self.tile_rows,
+            "tiles_resident": len(self.tiles),
+            "bytes_resident": self.bytes_resident,
+            "budget": self.budget,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
+
+
+def partition_entropies(codes, number_of_codes=243):
+    """Return the entropy of the partition each row of a (guesses x candidates) code array makes
+    >>> partition_entropies(np.array([[0, 0, 0, 0], [0, 1, 2, 3], [0, 0, 1, 1]], dtype=np.uint8)).tolist()
+    [0.0, 2.0, 1.0]
+    """
+    guesses, candidates = codes.shape
+    if candidates == 0:
+        return np.zeros(guesses)
+    offsets = codes.astype(np.int64) + number_of_codes * np.arange(guesses)[:, None]
+    counts = np.bincount(offsets.ravel(), minlength=guesses * number_of_codes).reshape(guesses, number_of_codes)
+    weighted = counts * np.log2(np.maximum(counts, 1))
+    return np.log2(candidates) - weighted.sum(axis=1) / candidates
+
+
+def guess_entropies(matrix, guesses, candidates, block=1024):
+    """Return the partition entropy of each guess (an index array) over the candidates (an index array)"""
+    guesses = np.asarray(guesses, dtype=np.int64)
+    candidates = np.asarray(candidates, dtype=np.int64)
+    entropies = np.empty(len(guesses))
+    for start in range(0, len(guesses), block):
+        rows = matrix.block(guesses[start : start + block], candidates)
+        entropies[start : start + block] = partition_entropies(rows, number_of_codes(matrix.size))
+    return entropies
+
+
+def cache_key(words):
+    """Return the key a cached matrix is stored under: a hash of the words, their size and the feedback rules
+    >>> len(cache_key(['blood', 'knoll']))
+    32
+    >>> cache_key(['blood', 'knoll']) == cache_key(['knoll', 'blood'])
+    False
+    """
+    digest = hashlib.sha256()
+    size = len(words[0]) if words else 0
+    digest.update(f"{FEEDBACK_RULES}\n{size}\n".encode("utf-8"))
+    digest.update("\n".join(words).encode("utf-8"))
+    return digest.digest()
+
+
+def cache_file(word_file):
+    """Return the file the feedback matrix for a word list is cached in, next to the word list"""
+    return word_file + CACHE_SUFFIX
+
+
+def save_matrix(path, matrix):
+    """Write a feedback matrix to a cache file (see atomic_write)"""
+    header = CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, matrix.size, len(matrix), cache_key(matrix.words))
+
+    def write(f):
+        f.write(header)
+        f.write(np.ascontiguousarray(matrix.codes).tobytes())
+
+    atomic_write(path, write)
+
+
+def load_matrix(path, words):
+    """Memory-map a cached feedback matrix, or return None if it is missing or stale.
+    Every process mapping the same file shares its pages.
+    """
+    words = list(words)
+    try:
+        with open(path, "rb") as f:
+            header = f.read(CACHE_HEADER.size)
+    except OSError:
+        return None
+    if len(header) != CACHE_HEADER.size:
+        return None
+    magic, version, size, n, key = CACHE_HEADER.unpack(header)
+    expected_size = len(words[0]) if words else 0
+    if (
+        magic != CACHE_MAGIC
+        or version != CACHE_VERSION
+        or size != expected_size
+        or n != len(words)
+        or key != cache_key(words)
+        or os.path.getsize(path) != CACHE_HEADER.size + n * n
+    ):
+        return None
+    codes = np.memmap(path, dtype=np.uint8, mode="r", offset=CACHE_HEADER.size, shape=(n, n))
+    return FeedbackMatrix(words, codes)
+
+
+def cached_feedback_matrix(words, word_file=None):
+    """Return the feedback matrix for some words, from the cache next to word_file if it is fresh.
+    A missing or stale cache is rebuilt; if it can't be written we carry on with the matrix in memory.
+    """
+    if word_file is None:
+        return FeedbackMatrix(words)
+    path = cache_file(word_file)
+    matrix = load_matrix(path, words)
+    if matrix is not None:
+        return matrix
+    matrix = FeedbackMatrix(words)
+    try:
+        save_matrix(path, matrix)
+    except OSError:
+        return matrix
+    return load_matrix(path, words) or matrix
+
+
+if __name__ == "__main__":
+    import doctest
+
+    print("Testing...")
+    doctest.testmod()
+    print("Done.")
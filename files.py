@@ -0,0 +1,37 @@
+import os
+
+
+def atomic_write(path, write, mode="wb"):
+    """
+    Write a file by calling write(f) on a temporary file next to it, then renaming that into
+    place, so readers never see half a file (and a failed write leaves the old one alone)
+    >>> import json, tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), "data.json")
+    >>> atomic_write(path, lambda f: json.dump({"a": 1}, f), "w")
+    >>> json.load(open(path))
+    {'a': 1}
+    >>> def fail(f):
+    ...     raise OSError("disk full")
+    >>> atomic_write(path, fail, "w")
+    Traceback (most recent call last):
+    ...
+    OSError: disk full
+    >>> json.load(open(path)), os.listdir(os.path.dirname(path))
+    ({'a': 1}, ['data.json'])
+    """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, mode) as f:
+            write(f)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    print("Testing...")
+    doctest.testmod()
+    print("Done.")
@@ -1,16 +1,19 @@
 # from solver import *
 from collections import Counter
 
+from candidates import CandidateSet
 from solver import Solver
-from wordle_knowledge import WordleKnowledge
 
 
 class FrequencyBasedSolver(Solver):
 
   def __init__(self, wordle, wordhoard=None, verbose=False):
     super().__init__(wordle, wordhoard, verbose)
-    self.possible_solutions_list = set(self.wordhoard.words)
-    self.state = WordleKnowledge(wordle, self.wordhoard)
+    self.reset(wordle)
+
+  def reset(self, wordle):
+    super().reset(wordle)
+    self.candidates = CandidateSet.all_words(self.wordhoard)
 
   def update(self, guess, feedback):
         """Update the knowledge of the wordle puzzle
@@ -18,16 +21,20 @@ class FrequencyBasedSolver(Solver):
         # call the super method
         super().update(guess, feedback)
         # print(f"[bold blue]{guess}[/bold blue]; {color_feedback(feedback, guess)}")
-        self.state.update(guess, feedback)
-        self.possible_solutions_list = [
-            word
-            for word in self.possible_solutions_list
-            if self.state.is_consistent(word) and word != guess
-        ]
-        # print(f"{len(self.possible_solutions_list)} possible solutions")
+        self.candidates = self.candidates.after_feedback(guess, feedback).discard(guess)
+        # print(f"{len(self.candidates)} possible solutions")
 
   def possible_solutions(self):
-    return self.possible_solutions_list
+    return self.candidates.words()
+
+  def has_solutions(self):
+    return bool(self.candidates)
+
+  def number_of_solutions(self):
+    return len(self.candidates)
+
+  def position_key(self):
+    return (self.__class__.__name__, self.GUESS_VERSION, self.wordhoard.key, self.candidates.key())
 
   def guess(self):
-      return self.wordhoard.most_frequent_word(self.possible_solutions_list)
+      return self.candidates.most_frequent()
@@ -4,8 +4,15 @@ import math
 import random
 from functools import cache
 
+import numpy as np
+
+from candidates import CandidateSet
+from feedback import feedback_code, guess_entropies, number_of_codes
 from solver import Solver
-from wordle_knowledge import WordleKnowledge
+
+
+# The best opening guess and its entropy, by word list, answers and mode
+_opening_guesses = {}
 
 
 @cache
@@ -16,21 +23,38 @@ def all_possible_feedbacks(size):
 
 class InfoTheoreticSolver(Solver):
 
-  def __init__(self, wordle, wordhoard=None, verbose=False, easy_mode=True, top_n=4500):
+  def __init__(self, wordle, wordhoard=None, verbose=False, easy_mode=True, top_n=4500, sampler=None):
     super().__init__(wordle, wordhoard, verbose)
     self.easy_mode = easy_mode
     self.top_n = top_n
-    # First, we limit our possible solutions to _common_ words
-    most_frequent = self.wordhoard.most_frequent_words(self.top_n)
-    self.possible_solutions_list = set(most_frequent)
+    # an EntropySampler to estimate entropies with, or None to work them out exactly
+    self.sampler = sampler
+    self.reset(wordle)
 
-    self.state = WordleKnowledge(wordle, self.wordhoard)
+  def reset(self, wordle):
+    super().reset(wordle)
+    # First, we limit our possible solutions to _common_ words
+    self.candidates = CandidateSet.top(self.wordhoard, self.top_n)
+    # Words we may guess: any word in easy mode, only words consistent with the hints in hard mode
+    self.allowed = CandidateSet.all_words(self.wordhoard)
+    # how many guesses the last best_guess scored
+    self.guesses_scored = 0
 
   # guessing 'fishy' and the word is 'doggy' -> feedback '.....'
 
+  def feedback_codes(self, guess):
+    """Return the feedback codes of a guess against each possible solution, from the feedback matrix if we can"""
+    matrix = self.wordhoard.feedback_matrix()
+    if matrix is None or guess not in matrix:
+      return [feedback_code(guess, possible_solution) for possible_solution in self.candidates]
+    return matrix.row(guess)[self.solution_indices()].tolist()
+
+  def solution_indices(self):
+    """Return the feedback matrix indices of the possible solutions"""
+    return self.candidates.indices()
+
   def collect_wordgroups_by_feedback(self, guess):
-    word_feedbacks = [(possible_solution, self.wordle.feedback(guess, possible_solution)) for possible_solution in self.possible_solutions_list]
-    return itertools.groupby(word_feedbacks, lambda x: x[1])
+    return itertools.groupby(sorted(self.feedback_codes(guess)))
 
   def wordgroup_entropy(self, wordgroups):
     sizes = [len(list(g)) for _, g in wordgroups]
@@ -40,28 +64,160 @@ class InfoTheoreticSolver(Solver):
   def guess_entropy(self, guess):
     return self.wordgroup_entropy(self.collect_wordgroups_by_feedback(guess))
 
+  def guess_entropies(self, guesses):
+    """Return the entropy of each guess, scoring them all in one batch if we have the feedback matrix"""
+    return self.guess_estimates(guesses)[0]
+
+  def guess_estimates(self, guesses):
+    """Return the entropy of each guess and its standard error, 0 unless the sampler estimated it"""
+    matrix = self.wordhoard.feedback_matrix()
+    if matrix is None or not all(guess in matrix for guess in guesses):
+      return [self.guess_entropy(guess) for guess in guesses], [0.0] * len(guesses)
+    if self.sampler is not None:
+      entropies, errors = self.sampler.entropies(matrix, matrix.indices(guesses), self.solution_indices())
+      return entropies.tolist(), errors.tolist()
+    return guess_entropies(matrix, matrix.indices(guesses), self.solution_indices()).tolist(), [0.0] * len(guesses)
+
+  def ranked_guesses(self, guesses):
+    """
+    Return (guess, entropy, standard error) triples, highest entropy first, ties going to
+    guesses that could be the answer and then to the alphabetically first guess
+    """
+    entropies, errors = self.guess_estimates(guesses)
+    return sorted(zip(guesses, entropies, errors), key=self.rank_key)
+
+  def rank_key(self, scored):
+    guess, entropy = scored[:2]
+    # rounding so that equal partitions tie exactly, whatever order their sizes were summed in
+    return (-round(entropy, 10), guess not in self.candidates, guess)
+
+  def entropy_bounds(self, guesses):
+    """
+    Return an upper bound on the entropy of each guess (an index array) over the possible
+    solutions: log2 of how many feedbacks it could get. That is at most 243, the number of
+    solutions, and the product over positions of the colors its letter could be there, going
+    by where the solutions have it.
+    """
+    n = len(self.candidates)
+    lexicon = self.wordhoard.lexicon()
+    letters = lexicon.letters[guesses]
+    at = self.candidates.position_counts()
+    anywhere = at.sum(axis=0)
+    patterns = np.ones(len(guesses))
+    for i in range(lexicon.size):
+      here = at[i, letters[:, i]]
+      # green if a solution has the letter here; grey, or yellow if one has it elsewhere, if one doesn't
+      patterns *= (here > 0) + (here < n) * (1 + (anywhere[letters[:, i]] > here))
+    return np.log2(np.minimum(patterns, min(number_of_codes(lexicon.size), n)))
+
+  def letter_coverage(self, guesses):
+    """Return how many of the solutions' letters the distinct letters of each guess (an index array) cover"""
+    lexicon = self.wordhoard.lexicon()
+    letters = lexicon.letters[guesses]
+    counts = self.candidates.position_counts().sum(axis=0)
+    coverage = np.zeros(len(guesses), dtype=np.int64)
+    for i in range(lexicon.size):
+      repeated = (letters[:, :i] == letters[:, i, None]).any(axis=1)
+      coverage += np.where(repeated, 0, counts[letters[:, i]])
+    return coverage
+
+  def best_guess(self, guesses, block=512):
+    """
+    Return the (guess, entropy, error) ranked_guesses would put first, by branch and bound: guesses are
+    scored a block at a time, the highest bounds and best letter coverage first, and skipped once
+    their bounds show they can't beat (or win a tie with) the best so far
+    >>> from wordle import Wordle
+    >>> solver = InfoTheoreticSolver(Wordle(target="knoll"))
+    >>> solver.update("tares", "·····")
+    >>> pool = solver.guess_pool()
+    >>> solver.best_guess(pool)[0] == solver.ranked_guesses(pool)[0][0]
+    True
+    >>> solver.guesses_scored < len(pool)
+    True
+    """
+    matrix = self.wordhoard.feedback_matrix()
+    if self.sampler is not None or matrix is None or not all(guess in matrix for guess in guesses):
+      self.guesses_scored = len(guesses)
+      return self.ranked_guesses(guesses)[0]
+    indices = matrix.indices(guesses)
+    # the tie-breaks: possible solutions first, then the first word (the words are in sorted order)
+    possible = self.candidates.mask[indices]
+    bounds = self.entropy_bounds(indices)
+    order = np.lexsort((-self.letter_coverage(indices), -bounds))
+    best, best_entropy = None, -math.inf
+    self.guesses_scored = 0
+    for start in range(0, len(order), block):
+      chunk = order[start : start + block]
+      if best is not None:
+        if bounds[chunk[0]] < best_entropy - 1e-9:
+          # the bounds only go down from here
+          break
+        wins_tie = (possible[chunk] > possible[best]) | ((possible[chunk] == possible[best]) & (indices[chunk] < indices[best]))
+        chunk = chunk[(bounds[chunk] > best_entropy + 1e-9) | ((bounds[chunk] >= best_entropy - 1e-9) & wins_tie)]
+        if len(chunk) == 0:
+          continue
+      # rounding so that equal partitions tie exactly, as in ranked_guesses
+      entropies = np.round(guess_entropies(matrix, indices[chunk], self.solution_indices()), 10)
+      self.guesses_scored += len(chunk)
+      top = chunk[entropies == entropies.max()]
+      leader = top[np.lexsort((indices[top], ~possible[top]))[0]]
+      if best is None or (entropies.max(), possible[leader], -indices[leader]) > (best_entropy, possible[best], -indices[best]):
+        best, best_entropy = leader, entropies.max()
+    return guesses[best], float(best_entropy), 0.0
+
+  def guess_pool(self):
+    """Return the words to rank for the next guess"""
+    matrix = self.wordhoard.feedback_matrix()
+    if matrix is None or not matrix.dense:
+      # without every row at hand, scoring the whole vocabulary each turn is far too slow
+      return self.candidates.words()
+    return self.allowed.words()
+
 
   def update(self, guess, feedback):
         """Update the knowledge of the wordle puzzle
         """
         # call the super method
         super().update(guess, feedback)
-        self.state.update(guess, feedback)
-        self.possible_solutions_list = [
-            word
-            for word in self.possible_solutions_list
-            if self.state.is_consistent(word) and word != guess
-        ]
+        self.candidates = self.candidates.after_feedback(guess, feedback).discard(guess)
+        if not self.easy_mode:
+          self.allowed = self.allowed.after_feedback(guess, feedback)
 
   def possible_solutions(self):
-    return self.possible_solutions_list
+    return self.candidates.words()
+
+  def has_solutions(self):
+    return bool(self.candidates)
+
+  def number_of_solutions(self):
+    return len(self.candidates)
+
+  def position_key(self):
+    return (
+      self.__class__.__name__,
+      self.GUESS_VERSION,
+      self.wordhoard.key,
+      self.easy_mode,
+      self.top_n,
+      None if self.sampler is None else self.sampler.key(),
+      self.candidates.key(),
+      # in hard mode the hints limit the guesses too
+      None if self.easy_mode else self.allowed.key(),
+    )
 
   def guess(self):
       # return best by entropy
-      print("considering entropies...")
-      entropies = [self.guess_entropy(g) for g in self.possible_solutions_list]
-      zipped = zip(self.possible_solutions_list, entropies)
-      sorted_zipped = sorted(zipped, key=lambda x: x[1], reverse=True)
-      best_guess, best_entropy = sorted_zipped[0]
-      print(f"Best guess: {best_guess} with entropy {best_entropy}")
+      if self.verbose:
+        print("considering entropies...")
+      if not self.guesses:
+        # every game starts from the same position, so rank the opening once per process
+        sampling = None if self.sampler is None else self.sampler.key()
+        key = (self.wordhoard.file, self.candidates.key(), self.easy_mode, sampling)
+        if key not in _opening_guesses:
+          _opening_guesses[key] = self.best_guess(self.guess_pool())
+        best_guess, best_entropy, error = _opening_guesses[key]
+      else:
+        best_guess, best_entropy, error = self.best_guess(self.guess_pool())
+      if self.verbose:
+        print(f"Best guess: {best_guess} with entropy {best_entropy}" + (f" ± {error:.3f}" if error else ""))
       return best_guess
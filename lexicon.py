@@ -0,0 +1,263 @@
+import os
+import struct
+from functools import cached_property
+from types import MappingProxyType
+
+import numpy as np
+
+from feedback import letter_array
+from files import atomic_write
+
+# A compiled lexicon: a header, then the words (sorted, UTF-8, zero-padded to a fixed width),
+# their frequencies, and the word indices by frequency, most frequent first
+LEXICON_MAGIC = b"WLEX"
+LEXICON_VERSION = 1
+LEXICON_HEADER = struct.Struct("<4sIIIQ")  # magic, version, word width in bytes, word size, number of words
+LEXICON_SUFFIX = ".wlx"
+
+
+def read_only(array):
+    array.flags.writeable = False
+    return array
+
+
+def padded(n):
+    """Return n rounded up to a multiple of 8, so the arrays after the words stay aligned
+    >>> padded(0), padded(5), padded(8)
+    (0, 8, 8)
+    """
+    return -(-n // 8) * 8
+
+
+class Lexicon:
+    """
+    What solvers and games need to know about a word list that never changes: the words in
+    index order, their frequencies, the alphabet, the frequency ranking and top-n masks.
+    Built once per word list (see WordHoard.lexicon) and shared by every game, so starting
+    a game doesn't rescan the vocabulary. Anything not needed up front is worked out on
+    first use, so a lexicon mapped from a compiled file opens almost instantly.
+    >>> lexicon = Lexicon.from_frequencies({"blood": 10, "knoll": 30, "audio": 10, "radio": 20})
+    >>> lexicon.words
+    ('audio', 'blood', 'knoll', 'radio')
+    >>> lexicon.size, lexicon.alphabet
+    (5, 'abdiklnoru')
+    >>> lexicon.top(3)
+    ('knoll', 'radio', 'audio')
+    >>> lexicon.top_mask(3).tolist()
+    [True, False, True, True]
+    >>> lexicon.index["knoll"], lexicon.rank["knoll"]
+    (2, 0)
+    """
+
+    def __init__(self, words, frequencies, ranking=None, size=None):
+        """
+        words: the words in sorted order, as strings or as a fixed-width UTF-8 bytes array
+        frequencies: an array of their frequencies, in the same order
+        """
+        self._words = words
+        self.frequencies = frequencies
+        if ranking is None:
+            # most frequent first, ties alphabetically (the words are already in that order)
+            ranking = read_only(np.argsort(-frequencies, kind="stable"))
+        self.ranking = ranking
+        if size is None:
+            sizes = set(len(word) for word in self.words)
+            # None when the words aren't all the same size
+            size = sizes.pop() if len(sizes) == 1 else None
+        self.size = size
+        self._top_masks = {}
+
+    @classmethod
+    def from_frequencies(cls, frequencies):
+        """Make a lexicon from a dict of words and frequencies"""
+        words = tuple(sorted(frequencies))
+        return cls(words, read_only(np.array([frequencies[word] for word in words], dtype=np.int64)))
+
+    @cached_property
+    def words(self):
+        if isinstance(self._words, np.ndarray):
+            return tuple(word.decode("utf-8") for word in self._words.tolist())
+        return tuple(self._words)
+
+    @cached_property
+    def word_set(self):
+        return frozenset(self.words)
+
+    @cached_property
+    def index(self):
+        return MappingProxyType({word: i for i, word in enumerate(self.words)})
+
+    @cached_property
+    def alphabet(self):
+        return "".join(sorted(set("".join(self.words))))
+
+    @cached_property
+    def ranked(self):
+        words = self.words
+        return tuple(words[i] for i in self.ranking)
+
+    @cached_property
+    def rank(self):
+        return MappingProxyType({word: r for r, word in enumerate(self.ranked)})
+
+    @cached_property
+    def ranks(self):
+        """The frequency rank of each word, by index: 0 for the most frequent"""
+        ranks = np.empty(len(self), dtype=np.int64)
+        ranks[self.ranking] = np.arange(len(self))
+        return read_only(ranks)
+
+    @cached_property
+    def ranked_frequencies(self):
+        return read_only(np.asarray(self.frequencies)[self.ranking])
+
+    @cached_property
+    def letters(self):
+        """The words as a (words x positions) uint8 array of letters, numbered by the alphabet"""
+        if self.size is None:
+            raise ValueError("Words of different sizes don't make a letter matrix")
+        return read_only(letter_array(self.words))
+
+    def position_counts(self, selection=None):
+        """
+        Return a (positions x alphabet) array of how often each letter is at each position,
+        over the words picked out by a mask or an index array (all of them by default)
+        >>> lexicon = Lexicon.from_frequencies({"blood": 10, "knoll": 30, "audio": 10})
+        >>> lexicon.alphabet
+        'abdiklnou'
+        >>> lexicon.position_counts(np.array([False, True, True]))[2].tolist()
+        [0, 0, 0, 0, 0, 0, 0, 2, 0]
+        """
+        letters = self.letters if selection is None else self.letters[selection]
+        letters_in_alphabet = len(self.alphabet)
+        offsets = letters.astype(np.int64) + letters_in_alphabet * np.arange(self.size)
+        counts = np.bincount(offsets.ravel(), minlength=self.size * letters_in_alphabet)
+        return counts.reshape(self.size, letters_in_alphabet)
+
+    def letter_counts(self, selection=None):
+        """Return how often each letter of the alphabet occurs over the words, as position_counts does
+        >>> lexicon = Lexicon.from_frequencies({"blood": 10, "knoll": 30, "audio": 10})
+        >>> dict(zip(lexicon.alphabet, lexicon.letter_counts([1, 2, 2]).tolist()))["o"]
+        4
+        """
+        return self.position_counts(selection).sum(axis=0)
+
+    def most_frequent(self, mask):
+        """Return the index of the most frequent word in a mask over the words, or None if it's empty
+        >>> lexicon = Lexicon.from_frequencies({"blood": 10, "knoll": 30, "audio": 10})
+        >>> lexicon.most_frequent(np.array([True, True, False]))
+        0
+        >>> lexicon.most_frequent(np.zeros(3, dtype=bool)) is None
+        True
+        """
+        if not mask.any():
+            return None
+        return int(np.where(mask, self.ranks, len(self)).argmin())
+
+    def count_with_frequency(self, frequency):
+        """Return how many words are at least this frequent, by binary search of the ranking
+        >>> lexicon = Lexicon.from_frequencies({"blood": 10, "knoll": 30, "audio": 10})
+        >>> lexicon.count_with_frequency(10), lexicon.count_with_frequency(11), lexicon.count_with_frequency(31)
+        (3, 1, 0)
+        """
+        return int(np.searchsorted(-self.ranked_frequencies, -frequency, side="right"))
+
+    def __len__(self):
+        return len(self.frequencies)
+
+    def __contains__(self, word):
+        return word in self.word_set
+
+    def top(self, n):
+        """Return the n most frequent words, most frequent first"""
+        return self.ranked[0:n]
+
+    def top_mask(self, n):
+        """Return a read-only mask over the words of the n most frequent ones"""
+        if n not in self._top_masks:
+            mask = np.zeros(len(self), dtype=bool)
+            mask[self.ranking[0:n]] = True
+            self._top_masks[n] = read_only(mask)
+        return self._top_masks[n]
+
+    def all_mask(self):
+        """Return a read-only mask over all the words"""
+        return self.top_mask(len(self))
+
+
+def lexicon_file(word_file):
+    """Return the file a word list is compiled to, next to the word list"""
+    return word_file + LEXICON_SUFFIX
+
+
+def save_lexicon(path, lexicon):
+    """Write a compiled lexicon (see atomic_write)
+    >>> import tempfile
+    >>> lexicon = Lexicon.from_frequencies({"blood": 10, "knoll": 30, "ábhar": 20})
+    >>> path = os.path.join(tempfile.mkdtemp(), "words.wlx")
+    >>> save_lexicon(path, lexicon)
+    >>> loaded = load_lexicon(path)
+    >>> loaded.words, loaded.top(2), loaded.size
+    (('blood', 'knoll', 'ábhar'), ('knoll', 'ábhar'), 5)
+    """
+    encoded = [word.encode("utf-8") for word in lexicon.words]
+    width = max((len(word) for word in encoded), default=1)
+    words = np.array(encoded, dtype=f"S{width}")
+    n = len(encoded)
+    header = LEXICON_HEADER.pack(LEXICON_MAGIC, LEXICON_VERSION, width, lexicon.size or 0, n)
+
+    def write(f):
+        f.write(header)
+        f.write(words.tobytes())
+        f.write(b"\0" * (padded(n * width) - n * width))
+        f.write(np.asarray(lexicon.frequencies, dtype="<i8").tobytes())
+        f.write(np.asarray(lexicon.ranking, dtype="<i8").tobytes())
+
+    atomic_write(path, write)
+
+
+def load_lexicon(path):
+    """Memory-map a compiled lexicon, or return None if it isn't one we can read"""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(LEXICON_HEADER.size)
+    except OSError:
+        return None
+    if len(header) != LEXICON_HEADER.size:
+        return None
+    magic, version, width, size, n = LEXICON_HEADER.unpack(header)
+    words_bytes = padded(n * width)
+    if (
+        magic != LEXICON_MAGIC
+        or version != LEXICON_VERSION
+        or os.path.getsize(path) != LEXICON_HEADER.size + words_bytes + 16 * n
+    ):
+        return None
+    if n == 0:
+        return Lexicon((), read_only(np.zeros(0, dtype=np.int64)))
+    offset = LEXICON_HEADER.size
+    words = np.memmap(path, dtype=f"S{width}", mode="r", offset=offset, shape=(n,))
+    offset += words_bytes
+    frequencies = np.memmap(path, dtype="<i8", mode="r", offset=offset, shape=(n,))
+    offset += 8 * n
+    ranking = np.memmap(path, dtype="<i8", mode="r", offset=offset, shape=(n,))
+    return Lexicon(words, frequencies, ranking, size or None)
+
+
+def compiled_lexicon(word_file):
+    """Return the compiled lexicon next to a word list, if there is one at least as new as the list"""
+    path = lexicon_file(word_file)
+    try:
+        if os.path.getmtime(path) < os.path.getmtime(word_file):
+            return None
+    except OSError:
+        return None
+    return load_lexicon(path)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    print("Testing...")
+    doctest.testmod()
+    print("Done.")
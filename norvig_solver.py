@@ -1,16 +1,27 @@
 # from solver import *
 
+from candidates import CandidateSet
 from ir_solver import InfoTheoreticSolver
 
 
 class NorvigSolver(InfoTheoreticSolver):
-    def __init__(self, wordle, wordhoard, verbose=False, mode="ir", top_n=4500):
-        super().__init__(wordle, wordhoard, verbose, mode, top_n)
-        self.possible_solutions_list = self.possible_solutions_list | set(['handy', 'swift', 'glove', 'crump'])
-        self.initial_guesses = ['handy', 'swift', 'glove', 'crump']
+    OPENERS = ['handy', 'swift', 'glove', 'crump']
+
+    def __init__(self, wordle, wordhoard, verbose=False, easy_mode=True, top_n=4500, sampler=None):
+        super().__init__(wordle, wordhoard, verbose, easy_mode, top_n, sampler)
+
+    def reset(self, wordle):
+        super().reset(wordle)
+        # only the ones we can play: another language's word list won't have them
+        self.initial_guesses = [guess for guess in self.OPENERS if guess in self.wordhoard.words]
+        self.candidates = self.candidates | CandidateSet.from_words(self.wordhoard, self.initial_guesses)
+
+    def position_key(self):
+        # the openers are played by turn, whatever the candidates
+        return super().position_key() + (min(len(self.guesses), len(self.initial_guesses)),)
 
     def guess(self):
-        if len(self.possible_solutions()) == 1:
+        if self.number_of_solutions() == 1:
             return list(self.possible_solutions())[0]
         if len(self.guesses) < len(self.initial_guesses):
             return self.initial_guesses[len(self.guesses)]
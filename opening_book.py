@@ -0,0 +1,163 @@
+import argparse
+import json
+import time
+
+from feedback import cache_key, decode_feedback, encode_feedback
+
+BOOK_VERSION = 1
+
+
+def history_key(guesses, feedbacks):
+    """Return the book key for a game so far
+    >>> history_key([], [])
+    ''
+    >>> history_key(['tares', 'doily'], ['····y', 'ggggg'])
+    'tares:1,doily:242'
+    """
+    return ",".join(f"{guess}:{encode_feedback(feedback)}" for guess, feedback in zip(guesses, feedbacks))
+
+
+class OpeningBook:
+    """
+    The next guess to make for the first few turns of a game, by the guesses and feedback so far
+    >>> book = OpeningBook()
+    >>> book.add([], [], 'tares')
+    >>> book.add(['tares'], ['····y'], 'doily')
+    >>> book.lookup([], [])
+    'tares'
+    >>> book.lookup(['tares'], ['····y'])
+    'doily'
+    >>> book.lookup(['tares'], ['ggggy']) is None
+    True
+    """
+
+    def __init__(self, moves=None, metadata=None, path=None):
+        self._moves = moves
+        self._metadata = metadata
+        self.path = path
+        if path is None:
+            self._moves = moves if moves is not None else {}
+            self._metadata = metadata if metadata is not None else {}
+
+    @classmethod
+    def open(cls, path):
+        """Return a book that reads its file only when it's first used, so startup stays fast"""
+        return cls(path=path)
+
+    def _load(self):
+        with open(self.path) as f:
+            data = json.load(f)
+        if data.get("version") != BOOK_VERSION:
+            raise ValueError(f"Unsupported opening book version in {self.path}: {data.get('version')}")
+        self._moves = data["moves"]
+        self._metadata = data.get("metadata", {})
+
+    @property
+    def moves(self):
+        if self._moves is None:
+            self._load()
+        return self._moves
+
+    @property
+    def metadata(self):
+        if self._metadata is None:
+            self._load()
+        return self._metadata
+
+    def check(self, solver_name, wordhoard, opts):
+        """Raise a ValueError if the book was built for another solver, word list, top_n or mode"""
+        expected = {
+            "solver": solver_name,
+            "word_list_key": cache_key(wordhoard.word_list).hex(),
+            "top_n": opts.top_n,
+            "mode": opts.mode,
+        }
+        for key, value in expected.items():
+            if key in self.metadata and self.metadata[key] != value:
+                raise ValueError(f"Opening book {self.path} was built for {key}={self.metadata[key]}, not {value}")
+
+    def __len__(self):
+        return len(self.moves)
+
+    def add(self, guesses, feedbacks, guess):
+        self.moves[history_key(guesses, feedbacks)] = guess
+
+    def lookup(self, guesses, feedbacks):
+        """Return the book's next guess, or None if the game has left the book"""
+        return self.moves.get(history_key(guesses, feedbacks))
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({"version": BOOK_VERSION, "metadata": self.metadata, "moves": self.moves}, f, indent=1, sort_keys=True)
+
+    @classmethod
+    def load(cls, path):
+        book = cls.open(path)
+        book._load()
+        return book
+
+
+def build_book(make_solver, depth=2, metadata=None):
+    """
+    Build a book by asking solvers (made fresh by make_solver) for their guess after every
+    feedback history that can happen in the first depth turns
+    """
+    book = OpeningBook(metadata=metadata)
+
+    def explore(guesses, feedbacks):
+        solver = make_solver()
+        for guess, feedback in zip(guesses, feedbacks):
+            solver.update(guess, feedback)
+        if not solver.has_solutions():
+            return
+        guess = solver.guess()
+        book.add(guesses, feedbacks, guess)
+        if len(guesses) + 1 >= depth:
+            return
+        wordhoard = solver.wordhoard
+        matrix = wordhoard.feedback_matrix()
+        size = len(guess)
+        if matrix is not None and guess in matrix:
+            codes = set(matrix.row(guess)[matrix.indices(solver.possible_solutions())].tolist())
+        else:
+            codes = set(encode_feedback(solver.wordle.feedback(guess, word)) for word in solver.possible_solutions())
+        codes.discard(encode_feedback("g" * size))
+        for code in sorted(codes):
+            explore(guesses + [guess], feedbacks + [decode_feedback(code, size)])
+
+    explore([], [])
+    return book
+
+
+if __name__ == "__main__":
+    from solver import create_solver
+    from wordhoard import WordHoard
+    from wordle import Wordle
+
+    parser = argparse.ArgumentParser(description="Build an opening book for a solver")
+    parser.add_argument("-s", "--solver", help="Solver class (frequency, ir, norvig, worst)", default="ir")
+    parser.add_argument("-w", "--words", help="Supplied Words", default=None)
+    parser.add_argument("-m", "--mode", help="Mode (hard/easy)", default="easy")
+    parser.add_argument("-n", "--top_n", help="Top N words to use", default=4500, type=int)
+    parser.add_argument("-d", "--depth", help="How many turns the book covers", default=2, type=int)
+    parser.add_argument("-o", "--output", help="Opening book file to write", default="opening_book.json")
+    args = parser.parse_args()
+    if args.solver == "random":
+        raise ValueError("A random solver can't have an opening book")
+    args.verbose = False
+    args.easy_mode = args.mode == "easy"
+
+    start_time = time.time()
+    wordhoard = WordHoard(args.words)
+    wordle = Wordle(wordhoard=wordhoard)
+    metadata = {
+        "solver": args.solver,
+        "words": args.words or "default",
+        "word_list_key": cache_key(wordhoard.word_list).hex(),
+        "top_n": args.top_n,
+        "mode": args.mode,
+        "depth": args.depth,
+    }
+    book = build_book(lambda: create_solver(args.solver, wordle, wordhoard, args), args.depth, metadata)
+    book.save(args.output)
+    print(f"Wrote {len(book)} moves to {args.output} in {time.time() - start_time:.2f} seconds")
@@ -0,0 +1,34 @@
+# Compile a file of words (and maybe frequencies) into a lexicon WordHoard can memory-map.
+# By default it is written next to the word file, where WordHoard picks it up while it's newer.
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from globals import FREQ_FILE  # noqa: E402
+from lexicon import Lexicon, lexicon_file, save_lexicon  # noqa: E402
+from wordhoard import read_frequencies  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-w", "--words", type=str, default=FREQ_FILE)
+    parser.add_argument("-o", "--output", type=str, default=None, help="Compiled file (default: WORDS.wlx)")
+    return parser.parse_args()
+
+
+def main():
+    opts = parse_args()
+    output = opts.output or lexicon_file(opts.words)
+    start_time = time.time()
+    # from the word file itself, not any compiled file already next to it
+    lexicon = Lexicon.from_frequencies(read_frequencies(opts.words))
+    save_lexicon(output, lexicon)
+    print(f"Wrote {len(lexicon)} words to {output} in {time.time() - start_time:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import argparse
+import importlib
 import json
 import math
 import time
@@ -21,52 +22,66 @@ def color_feedback(feedback, word):
     return cf
 
 
-def stats(solutions, start_time, include_solutions=False):
-    n = len(solutions)
-    number_solved = len(
-        list(solution for solution in solutions if solution.get("won") == True)
-    )
-    percent_solved = 0
-    if n > 0:
-        percent_solved = number_solved / n
-    number_no_solutions = len(
-        list([s for s in solutions if s.get("no_solution") == True])
-    )
-    average_guesses = 0
-    max_guesses = 0
-    min_guesses = 0
-    if n > 0:
-        counts = [len(solution.get("guesses")) for solution in solutions]
-        average_guesses = sum(counts) / n
-        max_guesses = max(counts)
-        min_guesses = min(counts)
-    if include_solutions:
-        return {
-            "number_played": n,
-            "number_solved": number_solved,
-            "percent_solved": percent_solved,
-            "failure_rate": 1 - percent_solved,
-            "number_no_solutions": number_no_solutions,
-            "average_guesses": average_guesses,
-            "max_guesses": max_guesses,
-            "min_guesses": min_guesses,
-            "elapsed_time": time.time() - start_time,
-            "solutions": solutions,
-        }
-    else:
+class RunningStats:
+    """
+    The stats() summary of a stream of games, kept as running totals so memory stays constant
+    >>> aggregate = RunningStats()
+    >>> aggregate.add({"won": True, "guesses": ["tares", "cigar"]})
+    >>> aggregate.add({"won": False, "no_solution": True, "guesses": ["tares"]})
+    >>> summary = aggregate.summary(time.time())
+    >>> summary["number_played"], summary["number_solved"], summary["average_guesses"]
+    (2, 1, 1.5)
+    >>> summary["guess_histogram"]
+    {1: 1, 2: 1}
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.number_solved = 0
+        self.number_no_solutions = 0
+        self.total_guesses = 0
+        self.max_guesses = 0
+        self.min_guesses = 0
+        self.histogram = {}
+
+    def add(self, solution):
+        count = len(solution.get("guesses"))
+        if self.n == 0:
+            self.min_guesses = self.max_guesses = count
+        self.n += 1
+        self.number_solved += solution.get("won") == True
+        self.number_no_solutions += solution.get("no_solution") == True
+        self.total_guesses += count
+        self.max_guesses = max(self.max_guesses, count)
+        self.min_guesses = min(self.min_guesses, count)
+        self.histogram[count] = self.histogram.get(count, 0) + 1
+
+    def summary(self, start_time):
+        percent_solved = self.number_solved / self.n if self.n > 0 else 0
         return {
-            "number_played": n,
-            "number_solved": number_solved,
+            "number_played": self.n,
+            "number_solved": self.number_solved,
             "percent_solved": percent_solved,
             "failure_rate": 1 - percent_solved,
-            "number_no_solutions": number_no_solutions,
-            "average_guesses": average_guesses,
-            "max_guesses": max_guesses,
-            "min_guesses": min_guesses,
+            "number_no_solutions": self.number_no_solutions,
+            "average_guesses": self.total_guesses / self.n if self.n > 0 else 0,
+            "max_guesses": self.max_guesses,
+            "min_guesses": self.min_guesses,
+            "guess_histogram": dict(sorted(self.histogram.items())),
             "elapsed_time": time.time() - start_time,
         }
 
 
+def stats(solutions, start_time, include_solutions=False, transpositions=None):
+    aggregate = RunningStats()
+    for solution in solutions:
+        aggregate.add(solution)
+    statistics = aggregate.summary(start_time)
+    if transpositions is not None:
+        statistics["transposition_table"] = transpositions.stats()
+    if include_solutions:
+        statistics["solutions"] = solutions
+    return statistics
 
 
 class Solver:
@@ -74,21 +89,102 @@ class Solver:
     Solver class for the wordle puzzle
     """
 
+    # What a solver's update() may change (whichever of them it has), saved before each
+    # guess so undo() can take it back. They are replaced on update, never changed in place.
+    UNDOABLE = ("candidates", "allowed", "node")
+    # Bump when a change to guess() changes the guesses a solver makes: position_key includes
+    # it, so the positions saved in transposition tables by the old code stop matching
+    GUESS_VERSION = 1
+
     def __init__(self, wordle, wordhoard=None, verbose=False):
-        self.wordle = wordle
         if wordhoard is None:
-            self.wordhoard = WordHoard()
+            self.wordhoard = wordle.wordhoard
         else:
             self.wordhoard = wordhoard
         self.verbose = verbose
+        self.opening_book = None
+        self.transpositions = None
+        Solver.reset(self, wordle)
+
+    def reset(self, wordle):
+        """Start a new game, keeping everything that doesn't depend on the game"""
+        self.wordle = wordle
         self.guesses = []
+        self.feedbacks = []
+        self.history = []
+
+    def snapshot(self):
+        return {name: getattr(self, name) for name in self.UNDOABLE if hasattr(self, name)}
 
     def update(self, guess, feedback):
+        self.history.append(self.snapshot())
         self.guesses += [guess]
+        self.feedbacks += [feedback]
+
+    def undo(self):
+        """
+        Take back the last guess and its feedback, returning the guess (None if there wasn't one)
+        >>> from frequency_based_solver import FrequencyBasedSolver
+        >>> solver = FrequencyBasedSolver(Wordle(target="knoll"))
+        >>> solver.update("lulls", "y··g·")
+        >>> before = solver.candidates
+        >>> solver.update("atoll", "··ggg")
+        >>> len(solver.candidates), solver.undo(), solver.candidates is before
+        (4, 'atoll', True)
+        """
+        if not self.history:
+            return None
+        for name, value in self.history.pop().items():
+            setattr(self, name, value)
+        self.feedbacks.pop()
+        return self.guesses.pop()
+
+    def next_guess(self):
+        """
+        Make a guess, straight from the opening book while the game is still in it, or from
+        the transposition table if the solver has been in this position before
+        """
+        if self.opening_book is not None:
+            guess = self.opening_book.lookup(self.guesses, self.feedbacks)
+            if guess is not None:
+                return guess
+        key = self.position_key() if self.transpositions is not None else None
+        if key is None:
+            return self.guess()
+        guess = self.transpositions.get(key)
+        if guess is None:
+            guess = self.guess()
+            self.transpositions.put(key, guess)
+        return guess
+
+    @classmethod
+    def remembers_positions(cls):
+        """Whether the solver defines a position_key, so its guesses go in a transposition table
+        >>> from frequency_based_solver import FrequencyBasedSolver
+        >>> from random_solver import RandomSolver
+        >>> FrequencyBasedSolver.remembers_positions(), RandomSolver.remembers_positions()
+        (True, False)
+        """
+        return cls.position_key is not Solver.position_key
+
+    def position_key(self):
+        """
+        Return everything guess() depends on, as a tuple, for solvers whose guess is the same
+        whenever that is (their GUESS_VERSION included); None for the rest, which aren't put in
+        the transposition table
+        """
+        return None
 
     def possible_solutions(self):
         return self.wordhoard.words
 
+    def has_solutions(self):
+        """Whether any possible solution is left; solvers that can tell without listing them do"""
+        return bool(self.possible_solutions())
+
+    def number_of_solutions(self):
+        return len(self.possible_solutions())
+
     def solve(self, guesses=[], max_turns=math.inf):
         """Solve the wordle puzzle, maybe"""
         if self.verbose:
@@ -96,11 +192,16 @@ class Solver:
         start_time = time.time()
         index = 0
         solved = False
+        no_solution = False
         while not solved and index < max_turns:
             if index < len(guesses):
                 guess = guesses[index]
+            elif not self.has_solutions():
+                # the target isn't among the words we're choosing from
+                no_solution = True
+                break
             else:
-                guess = self.guess()
+                guess = self.next_guess()
             index += 1
             (solved, feedback, turn, is_valid, is_over,) = self.wordle.make_guess(guess)
 
@@ -114,10 +215,10 @@ class Solver:
                         reverse=True,
                     )
                 )
-                if len(self.possible_solutions()) > 20:
+                if self.number_of_solutions() > 20:
                     word_string += "..."
-                status_string = f"{turn:2}. Target: {self.wordle.target} Guessing: {color_feedback(feedback,guess)}/{color_feedback(feedback, feedback)} words left: {len(self.possible_solutions())}"
-                if len(self.possible_solutions()) > 0:
+                status_string = f"{turn:2}. Target: {self.wordle.target} Guessing: {color_feedback(feedback,guess)}/{color_feedback(feedback, feedback)} words left: {self.number_of_solutions()}"
+                if self.has_solutions():
                     status_string += f": {word_string}"
                 print(status_string)
 
@@ -127,9 +228,10 @@ class Solver:
             "number_guesses": len(self.wordle.guesses()),
             "won": solved and len(self.wordle.guesses()) <= self.wordle.max_turns(),
             "found": solved,
+            "no_solution": no_solution,
             "guesses": self.wordle.guesses(),
             "word_count": len(self.wordle.words),
-            "words_left": len(self.possible_solutions()),
+            "words_left": self.number_of_solutions(),
             "elapsed_time": time.time() - start_time,
         }
 
@@ -139,25 +241,69 @@ class Solver:
 
 
 
+def entropy_sampler(opts):
+    """Return the EntropySampler the options ask for, or None to score guesses exactly"""
+    if getattr(opts, "entropy", "exact") == "exact":
+        return None
+    from entropy_sampling import EntropySampler
+    return EntropySampler(getattr(opts, "entropy_error", 0.01), getattr(opts, "entropy_time_budget", None))
+
+
+# The module and class of each solver, imported when it is first asked for
+SOLVER_CLASSES = {
+    "random": ("random_solver", "RandomSolver"),
+    "frequency": ("frequency_based_solver", "FrequencyBasedSolver"),
+    "ir": ("ir_solver", "InfoTheoreticSolver"),
+    "norvig": ("norvig_solver", "NorvigSolver"),
+    "worst": ("worst_solver", "WorstSolver"),
+    "optimal": ("decision_tree_solver", "DecisionTreeSolver"),
+}
+
+
+def solver_class(solver_name):
+    """Return a solver class by name"""
+    if solver_name not in SOLVER_CLASSES:
+        raise ValueError(f"Unknown solver: {solver_name}")
+    module, name = SOLVER_CLASSES[solver_name]
+    return getattr(importlib.import_module(module), name)
+
+
 def create_solver(solver_name, wordle, wordhoard, opts):
     """Create a solver by name"""
-    if solver_name == "random":
-        from random_solver import RandomSolver
-        return RandomSolver(wordle, wordhoard, opts.verbose)
-    elif solver_name == "frequency":
-        from frequency_based_solver import FrequencyBasedSolver
-        return FrequencyBasedSolver(wordle, wordhoard, opts.verbose)
-    elif solver_name == "ir":
-        from ir_solver import InfoTheoreticSolver
-        return InfoTheoreticSolver(wordle, wordhoard, opts.verbose, opts.mode, opts.top_n)
-    elif solver_name == "norvig":
-        from norvig_solver import NorvigSolver
-        return NorvigSolver(wordle, wordhoard, opts.verbose)
-    elif solver_name == "worst":
-        from worst_solver import WorstSolver
-        return WorstSolver(wordle, wordhoard, opts.verbose)
+    cls = solver_class(solver_name)
+    if solver_name in ("random", "frequency", "worst"):
+        solver = cls(wordle, wordhoard, opts.verbose)
+    elif solver_name in ("ir", "norvig"):
+        solver = cls(wordle, wordhoard, opts.verbose, opts.easy_mode, opts.top_n, entropy_sampler(opts))
     else:
-        raise ValueError(f"Unknown solver: {solver_name}")
+        if not opts.easy_mode:
+            raise ValueError("The optimal solver only plays easy mode")
+        solver = cls(
+            wordle,
+            wordhoard,
+            opts.verbose,
+            opts.top_n,
+            getattr(opts, "objective", "expected"),
+            getattr(opts, "beam", 5),
+            getattr(opts, "node_budget", 2000),
+            getattr(opts, "time_budget", None),
+            getattr(opts, "tree", None),
+        )
+    solver.opening_book = getattr(opts, "book", None)
+    solver.transpositions = getattr(opts, "transpositions", None)
+    return solver
+
+
+def solve_games(solver_name, puzzles, wordhoard, opts, guesses=[]):
+    """Solve each puzzle, yielding the solve() results, with one solver reset between games"""
+    solver = None
+    for puzzle in puzzles:
+        wordle = Wordle(target=puzzle, wordhoard=wordhoard)
+        if solver is None:
+            solver = create_solver(solver_name, wordle, wordhoard, opts)
+        else:
+            solver.reset(wordle)
+        yield solver.solve(guesses=guesses)
 
 if __name__ == "__main__":
 
@@ -169,7 +315,11 @@ if __name__ == "__main__":
 
      echo 'badly' | python solver.py
      echo 'badly' | python solver.py -v
-     cat wordlist.txt | python solver.py"""
+     cat wordlist.txt | python solver.py
+     cut -f1 data/puzzles.tsv | python solver.py -s ir --benchmark
+     cut -f1 data/puzzles.tsv | python solver.py -s ir -j 8 --ndjson > games.ndjson
+     cut -f1 data/puzzles.tsv | python solver.py -s ir -w data/google_5.tsv -n 50000 --entropy sampled
+     cut -f1 data/puzzles.tsv | python solver.py -s ir --transposition_table ir-positions.json"""
 
     parser = argparse.ArgumentParser(
         epilog=example_text,
@@ -188,33 +338,118 @@ if __name__ == "__main__":
 
     parser.add_argument("-w", "--words", help="Supplied Words", default=None)
 
-    parser.add_argument('-s', '--solver', help='Solver class (frequency, ir, norvig, random, worst)', default='frequency' )
+    parser.add_argument('-s', '--solver', help='Solver class (frequency, ir, norvig, optimal, random, worst)', default='frequency' )
 
     parser.add_argument('-m', '--mode', help='Mode (hard/easy)', default='easy' )
 
     parser.add_argument('-n', '--top_n', help='Top N words to use', default=4500, type=int )
 
+    parser.add_argument('-b', '--book', help='Opening book file (see opening_book.py)', default=None)
+
+    parser.add_argument('--objective', help='What the optimal solver minimizes (expected/worst)', default='expected')
+
+    parser.add_argument('--beam', help='Guesses the optimal solver tries at each node', default=5, type=int)
+
+    parser.add_argument('--node_budget', help='Nodes the optimal solver searches before going greedy', default=2000, type=int)
+
+    parser.add_argument('--time_budget', help='Seconds the optimal solver searches before going greedy', default=None, type=float)
+
+    parser.add_argument('--tree', help='Decision tree file for the optimal solver, built if missing', default=None)
+
+    parser.add_argument('-j', '--jobs', help='Worker processes to solve puzzles with', default=1, type=int)
+
+    parser.add_argument('--ndjson', help='Print each game as a JSON line as it finishes, then the summary', default=False, action='store_true')
+
+    parser.add_argument('--flush_every', help='Games between flushes of --ndjson output', default=100, type=int)
+
+    parser.add_argument('--benchmark', help='Print a JSON timing breakdown instead of the usual stats', default=False, action='store_true')
+
+    parser.add_argument('--entropy', help='How the ir and norvig solvers score guesses (exact/sampled)', default='exact')
+
+    parser.add_argument('--entropy_error', help='Bits within which sampled entropies settle the best guess', default=0.01, type=float)
+
+    parser.add_argument('--entropy_time_budget', help='Seconds sampled entropies may take per guess', default=None, type=float)
+
+    parser.add_argument('--transposition_size', help='Positions to remember the guesses of, across games (0 for none; per worker with -j)', default=100000, type=int)
+
+    parser.add_argument('--transposition_table', help='File to load the remembered guesses from and save them to (not with -j)', default=None)
+
+    parser.add_argument('--feedback_budget', help='MB of feedback rows to keep for word lists too big for a full matrix', default=None, type=int)
+
     args = parser.parse_args()
     if args.mode not in ['easy', 'hard']:
         raise ValueError(f"Unknown mode: {args.mode}")
     args.easy_mode = args.mode == 'easy'
-    if args.solver not in ['frequency', 'random', 'ir', 'norvig', 'worst']:
+    if args.feedback_budget is not None:
+        args.feedback_budget *= 1024 * 1024
+    if args.solver not in SOLVER_CLASSES:
         raise ValueError(f"Unknown solver: {args.solver}")
+    if args.objective not in ['expected', 'worst']:
+        raise ValueError(f"Unknown objective: {args.objective}")
+    if args.entropy not in ['exact', 'sampled']:
+        raise ValueError(f"Unknown entropy: {args.entropy}")
+    if args.transposition_table and args.jobs > 1:
+        # each worker fills its own table, and they are thrown away with the workers
+        raise ValueError("--transposition_table can't be used with -j: the workers' tables aren't saved")
+    if args.transposition_table and not solver_class(args.solver).remembers_positions():
+        raise ValueError(f"--transposition_table can't be used with the {args.solver} solver: it doesn't remember positions")
+    if args.transposition_table and args.transposition_size <= 0:
+        raise ValueError("--transposition_table can't be used with --transposition_size 0")
+
+
+    guesses = []
+    if args.guesses:
+        guesses = [guess.strip() for guess in args.guesses.split(",")]
 
+    if args.benchmark:
+        from benchmark import run_benchmark
+        puzzles = [puzzle.strip() for puzzle in sys.stdin if puzzle.strip()]
+        # not rich's print, which wraps long lines
+        sys.stdout.write(json.dumps(run_benchmark(args.solver, puzzles, args, guesses)) + "\n")
+        sys.exit(0)
 
     # puzzles = sys.stdin.read().splitlines()
     start_time = time.time()
 
-    wordhoard = None
-    if args.words:
-        wordhoard = WordHoard(file=args.words)
+    # One word hoard for every game, so the feedback matrix is only built once
+    wordhoard = WordHoard(file=args.words, feedback_budget=args.feedback_budget)
 
-    guesses = []
-    if args.guesses:
-        guesses = [guess.strip() for guess in args.guesses.split(",")]
-    solutions = []
-    for game, puzzle in enumerate(sys.stdin):
-        solver = create_solver(args.solver, Wordle(target=puzzle.strip(), wordhoard=wordhoard), wordhoard, args)
-        solutions.append(solver.solve(guesses=guesses))
-    statistics = stats(solutions, start_time)
-    print(json.dumps(statistics))
+    if args.book:
+        from opening_book import OpeningBook
+        args.book = OpeningBook.open(args.book)
+        args.book.check(args.solver, wordhoard, args)
+
+    args.transpositions = None
+    # only solvers with a position_key use the table, so only they get one (and its stats)
+    if args.transposition_size > 0 and solver_class(args.solver).remembers_positions():
+        from transposition import TranspositionTable
+        if args.transposition_table:
+            args.transpositions = TranspositionTable.load(args.transposition_table, args.transposition_size)
+        else:
+            args.transpositions = TranspositionTable(args.transposition_size)
+
+    # with -j each worker has its own copy of the table, so there are no counts here to report
+    reported_transpositions = args.transpositions if args.jobs == 1 else None
+    if args.jobs > 1:
+        from sweep import solve_puzzles
+        puzzles = (puzzle.strip() for puzzle in sys.stdin if puzzle.strip())
+        solutions = solve_puzzles(puzzles, args.words, args, guesses, args.jobs)
+    else:
+        solutions = solve_games(args.solver, (puzzle.strip() for puzzle in sys.stdin), wordhoard, args, guesses)
+    if args.ndjson:
+        # a line per game as it finishes, then the summary, holding only running totals
+        aggregate = RunningStats()
+        for game, solution in enumerate(solutions, 1):
+            aggregate.add(solution)
+            sys.stdout.write(json.dumps(solution) + "\n")
+            if game % args.flush_every == 0:
+                sys.stdout.flush()
+        summary = aggregate.summary(start_time)
+        if reported_transpositions is not None:
+            summary["transposition_table"] = reported_transpositions.stats()
+        sys.stdout.write(json.dumps({"summary": summary}) + "\n")
+    else:
+        statistics = stats(list(solutions), start_time, transpositions=reported_transpositions)
+        print(json.dumps(statistics))
+    if reported_transpositions is not None and args.transposition_table:
+        args.transpositions.save(args.transposition_table)
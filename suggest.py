@@ -14,6 +14,7 @@ parser.add_argument(
     "-s", "--solver", help="Kind of solver", type=str, default=None
 )
 parser.add_argument("-g", "--guesses", help="Supplied Guesses", default=None)
+parser.add_argument("-b", "--book", help="Opening book file", default=None)
 
 args = parser.parse_args()
 
@@ -28,16 +29,26 @@ else:
 feedback = '?????'
 args.verbose = True
 args.mode = 'easy'
+args.easy_mode = True
 args.top_n = 4500
-solver = create_solver(args.solver, Wordle(), WordHoard(), args)
+wordhoard = WordHoard()
+if args.book:
+  from opening_book import OpeningBook
+  args.book = OpeningBook.open(args.book)
+  args.book.check(args.solver, wordhoard, args)
+solver = create_solver(args.solver, Wordle(wordhoard=wordhoard), wordhoard, args)
 for guess in guesses:
   print(f"Guess: {guess} feedback? >", end=' ')
   feedback = sys.stdin.readline().strip().lower()
   solver.update(guess, feedback)
-while True and solver.possible_solutions() and feedback != 'ggggg':
-  guess = solver.guess()
-  print(f"Guess: {guess} feedback? >", end=' ')
+while True and solver.has_solutions() and feedback != 'ggggg':
+  guess = solver.next_guess()
+  print(f"Guess: {guess} feedback (or u to undo the last one)? >", end=' ')
   feedback = sys.stdin.readline().strip().lower()
+  if feedback == 'u':
+    # take back the last guess, say its feedback was mistyped
+    solver.undo()
+    continue
   solver.update(guess, feedback)
 
 print(f"Got it in {len(solver.guesses)}! Guesses: {', '.join(solver.guesses)}")
@@ -0,0 +1,197 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from solver import solve_games, solver_class, stats
+from transposition import TranspositionTable
+from wordhoard import WordHoard
+
+# Per-process state for sweep workers, set up once by init_worker
+_worker = {}
+
+
+def solver_options(solver="frequency", mode="easy", top_n=4500, transposition_size=100000):
+    """Return the options create_solver expects, for a quiet solver"""
+    return argparse.Namespace(
+        verbose=False,
+        mode=mode,
+        easy_mode=mode == "easy",
+        top_n=top_n,
+        solver=solver,
+        transposition_size=transposition_size,
+    )
+
+
+def init_worker(word_file, opts):
+    """
+    Load the word list, map the cached feedback matrix and start a transposition table,
+    once per worker process
+    """
+    wordhoard = WordHoard(word_file, getattr(opts, "feedback_budget", None))
+    wordhoard.feedback_matrix()
+    remembers_positions = solver_class(opts.solver).remembers_positions()
+    if getattr(opts, "transposition_size", 0) > 0 and remembers_positions and getattr(opts, "transpositions", None) is None:
+        opts.transpositions = TranspositionTable(opts.transposition_size)
+    _worker["wordhoard"] = wordhoard
+    _worker["opts"] = opts
+
+
+def play_games(guesses, puzzles, wordhoard, opts):
+    """Play every puzzle starting with the guesses, returning the solve() results"""
+    return list(solve_games(opts.solver, puzzles, wordhoard, opts, guesses))
+
+
+def run_task(opener, puzzles):
+    start_time = time.time()
+    solutions = play_games([opener], puzzles, _worker["wordhoard"], _worker["opts"])
+    return opener, solutions, time.time() - start_time
+
+
+def solve_task(guesses, puzzles):
+    return play_games(guesses, puzzles, _worker["wordhoard"], _worker["opts"])
+
+
+def solve_puzzles(puzzles, word_file=None, opts=None, guesses=[], jobs=None, chunk_size=8):
+    """
+    Solve a stream of puzzles over a process pool, yielding the solve() results in the
+    puzzles' order. Puzzles are read a chunk at a time, with only a few chunks per worker
+    in flight, so an endless stream is fine.
+    """
+    if opts is None:
+        opts = solver_options()
+    jobs = jobs or os.cpu_count() or 1
+    WordHoard(word_file).feedback_matrix()
+    puzzles = iter(puzzles)
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(word_file, opts)) as pool:
+        while True:
+            while len(pending) < 2 * jobs:
+                chunk = list(itertools.islice(puzzles, chunk_size))
+                if not chunk:
+                    break
+                pending.append(pool.submit(solve_task, guesses, chunk))
+            if not pending:
+                return
+            yield from pending.popleft().result()
+
+
+def summarize(opener, solutions, elapsed_time):
+    statistics = stats(solutions, time.time(), include_solutions=False)
+    statistics["first_guess"] = opener
+    statistics["elapsed_time"] = elapsed_time
+    return statistics
+
+
+def checkpoint_metadata(puzzles, wordhoard, opts):
+    """Return what a sweep's results depend on, recorded at the top of its checkpoint file"""
+    return {
+        "solver": opts.solver,
+        "mode": opts.mode,
+        "top_n": opts.top_n,
+        "word_list_key": wordhoard.key,
+        "puzzles_key": hashlib.sha256("\n".join(puzzles).encode("utf-8")).hexdigest(),
+    }
+
+
+def read_checkpoint(path, metadata=None):
+    """
+    Return the per-opener results already written to a checkpoint file, by opener. Raise a
+    ValueError if the file was written for other settings than metadata.
+    >>> import tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), "sweep.ndjson")
+    >>> with open(path, "w") as f:
+    ...     _ = f.write(json.dumps({"metadata": {"solver": "frequency"}}) + "\\n")
+    ...     _ = f.write(json.dumps({"first_guess": "tares", "failure_rate": 0.1}) + "\\n")
+    >>> list(read_checkpoint(path, {"solver": "frequency"}))
+    ['tares']
+    >>> read_checkpoint(path, {"solver": "ir"})  # doctest: +ELLIPSIS
+    Traceback (most recent call last):
+    ...
+    ValueError: Checkpoint ... was written for solver=frequency, not ir
+    """
+    done = {}
+    if path is None or not os.path.exists(path):
+        return done
+    recorded = None
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # a run interrupted mid-write leaves a partial last line
+                continue
+            if "metadata" in record:
+                recorded = record["metadata"]
+                continue
+            done[record["first_guess"]] = record
+    if metadata is not None and (done or recorded is not None):
+        if recorded is None:
+            raise ValueError(f"Checkpoint {path} doesn't record the settings it was written for")
+        for key, value in metadata.items():
+            if recorded.get(key) != value:
+                raise ValueError(f"Checkpoint {path} was written for {key}={recorded.get(key)}, not {value}")
+    return done
+
+
+def sweep(openers, puzzles, word_file=None, opts=None, jobs=None, checkpoint=None, chunk_size=None):
+    """
+    Play every opener against every puzzle over a process pool, yielding each opener's
+    statistics as soon as all its games are done. Finished openers are appended to the
+    checkpoint file, and openers already in it are skipped, so an interrupted sweep resumes.
+    The checkpoint starts with the settings it was written for, and a sweep with other
+    settings refuses to resume from it.
+    """
+    if opts is None:
+        opts = solver_options()
+    jobs = jobs or os.cpu_count() or 1
+    wordhoard = WordHoard(word_file)
+    metadata = checkpoint_metadata(puzzles, wordhoard, opts)
+    done = read_checkpoint(checkpoint, metadata)
+    pending = [opener for opener in openers if opener not in done]
+    if not pending:
+        return
+    # Build (or validate) the on-disk matrix cache here, so the workers just map it
+    wordhoard.feedback_matrix()
+    if chunk_size is None:
+        # enough chunks to keep every worker busy even with only a few openers left
+        chunks_per_opener = max(1, (4 * jobs) // len(pending))
+        chunk_size = max(1, -(-len(puzzles) // chunks_per_opener))
+    chunks = [puzzles[i : i + chunk_size] for i in range(0, len(puzzles), chunk_size)]
+
+    partial = {opener: ([], 0.0, len(chunks)) for opener in pending}
+    out = open(checkpoint, "a") if checkpoint else None
+    if out and out.tell() == 0:
+        out.write(json.dumps({"metadata": metadata}) + "\n")
+        out.flush()
+    try:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(word_file, opts)) as pool:
+            futures = [pool.submit(run_task, opener, chunk) for opener in pending for chunk in chunks]
+            for future in as_completed(futures):
+                opener, solutions, elapsed_time = future.result()
+                so_far, total_time, remaining = partial[opener]
+                so_far.extend(solutions)
+                remaining -= 1
+                partial[opener] = (so_far, total_time + elapsed_time, remaining)
+                if remaining == 0:
+                    statistics = summarize(opener, so_far, total_time + elapsed_time)
+                    del partial[opener]
+                    if out:
+                        out.write(json.dumps(statistics) + "\n")
+                        out.flush()
+                    yield statistics
+    finally:
+        if out:
+            out.close()
+
+
+def write_results(path, results):
+    """Write the consolidated sweep results, best opener first"""
+    ranked = sorted(results, key=lambda r: (r["failure_rate"], r["average_guesses"], r["first_guess"]))
+    with open(path, "w") as f:
+        json.dump(ranked, f, indent=1)
+    return ranked
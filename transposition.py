@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+from files import atomic_write
+
+# 2: positions keyed by the solver's GUESS_VERSION too
+TABLE_VERSION = 2
+
+
+def position_digest(key):
+    """Return the table key for a solver position: a digest of its key tuple, so it fits in a JSON file
+    >>> len(position_digest(("InfoTheoreticSolver", 1, True, 4500, b"\\x01")))
+    32
+    """
+    return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()[:32]
+
+
+class TranspositionTable:
+    """
+    The guess a deterministic solver made from a position (the words it could still be, and
+    whatever else its choice depends on), kept across games so a position seen before costs
+    a lookup. The least recently used positions are dropped beyond capacity.
+    >>> table = TranspositionTable(capacity=2)
+    >>> table.put(("a",), "tares")
+    >>> table.put(("b",), "doily")
+    >>> table.get(("a",))
+    'tares'
+    >>> table.put(("c",), "knoll")  # drops ("b",), used least recently
+    >>> table.get(("b",)) is None
+    True
+    >>> table.stats()
+    {'entries': 2, 'capacity': 2, 'hits': 1, 'misses': 1, 'evictions': 1, 'hit_rate': 0.5}
+    """
+
+    def __init__(self, capacity=100000):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """Return the guess stored for a position, or None"""
+        digest = position_digest(key)
+        guess = self.entries.get(digest)
+        if guess is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(digest)
+        return guess
+
+    def put(self, key, guess):
+        digest = position_digest(key)
+        self.entries[digest] = guess
+        self.entries.move_to_end(digest)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
+
+    def save(self, path):
+        """Write the table, least recently used first
+        >>> import tempfile
+        >>> table = TranspositionTable()
+        >>> table.put(("a",), "tares")
+        >>> path = os.path.join(tempfile.mkdtemp(), "table.json")
+        >>> table.save(path)
+        >>> TranspositionTable.load(path).get(("a",))
+        'tares'
+        """
+        data = {"version": TABLE_VERSION, "entries": list(self.entries.items())}
+        atomic_write(path, lambda f: json.dump(data, f), "w")
+
+    @classmethod
+    def load(cls, path, capacity=100000):
+        """Read a saved table, or start an empty one if the file isn't there yet"""
+        table = cls(capacity)
+        if not os.path.exists(path):
+            return table
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("version") != TABLE_VERSION:
+            raise ValueError(f"Unsupported transposition table version in {path}: {data.get('version')}")
+        for digest, guess in data["entries"]:
+            table.entries[digest] = guess
+        while len(table.entries) > capacity:
+            table.entries.popitem(last=False)
+        return table
+
+
+if __name__ == "__main__":
+    import doctest
+
+    print("Testing...")
+    doctest.testmod()
+    print("Done.")
@@ -0,0 +1,123 @@
+import heapq
+import math
+
+import numpy as np
+
+from feedback import guess_entropies, number_of_codes
+
+METRICS = ["entropy", "expected"]
+
+
+def pair_codes(matrix, first, seconds, answers):
+    """Return the joint (first, second) feedback codes of each second guess over the answers"""
+    first_codes = matrix.row_at(first)[answers].astype(np.int64) * number_of_codes(matrix.size)
+    return first_codes[None, :] + matrix.block(seconds, answers)
+
+
+def partition_sizes(codes):
+    """
+    Return the sizes of the parts each row of codes makes, and which row each part is from.
+    Sorting each row and measuring the runs is much cheaper than a histogram over the
+    243 * 243 possible joint codes.
+    >>> sizes, rows = partition_sizes(np.array([[3, 1, 3, 3], [0, 1, 2, 3]]))
+    >>> sizes.tolist(), rows.tolist()
+    ([1, 3, 1, 1, 1, 1], [0, 0, 1, 1, 1, 1])
+    """
+    ordered = np.sort(codes, axis=1)
+    rows, n = ordered.shape
+    starts = np.ones(ordered.shape, dtype=bool)
+    starts[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    starts = np.flatnonzero(starts.ravel())
+    sizes = np.diff(np.append(starts, rows * n))
+    return sizes, starts // n
+
+
+def pair_scores(matrix, first, seconds, answers, metric="entropy"):
+    """
+    Return the score of each (first, second) pair over the answers, higher is better:
+    the entropy of the joint partition, or minus the expected number of answers left
+    """
+    n = len(answers)
+    if n == 0:
+        return np.zeros(len(seconds))
+    sizes, rows = partition_sizes(pair_codes(matrix, first, seconds, answers))
+    if metric == "entropy":
+        weighted = np.bincount(rows, weights=sizes * np.log2(sizes), minlength=len(seconds))
+        return np.log2(n) - weighted / n
+    return -np.bincount(rows, weights=sizes.astype(np.float64) ** 2, minlength=len(seconds)) / n
+
+
+def score_bound(entropy_sum, n, metric="entropy"):
+    """
+    An upper bound on a pair's score, from the sum of its guesses' entropies.
+    A joint partition carries at most the information of its parts, and at most log2(n);
+    and since collision entropy never exceeds Shannon entropy, the expected number
+    left is at least n * 2**-H.
+    """
+    entropy = min(entropy_sum, math.log2(n)) if n > 0 else 0.0
+    if metric == "entropy":
+        return entropy
+    return -n * 2**-entropy
+
+
+def best_pairs(matrix, guesses, answers, metric="entropy", top=10, block=64):
+    """
+    Return the top (score, first, second) opener pairs over the answers, best first, and
+    how many pairs were actually scored. Pairs are visited in order of the sum of the
+    guesses' entropies, and abandoned as soon as that bound can't beat the top list.
+    """
+    guesses = np.asarray(guesses, dtype=np.int64)
+    answers = np.asarray(answers, dtype=np.int64)
+    n = len(answers)
+    entropies = guess_entropies(matrix, guesses, answers)
+    order = np.argsort(-entropies, kind="stable")
+    guesses = guesses[order]
+    entropies = entropies[order]
+    best = []  # min-heap of (score, -first, -second), the worst of the top at best[0]
+    scored = 0
+
+    def threshold():
+        return best[0][0] if len(best) >= top else -math.inf
+
+    for i in range(len(guesses) - 1):
+        if score_bound(entropies[i] + entropies[i + 1], n, metric) <= threshold():
+            break
+        for start in range(i + 1, len(guesses), block):
+            if score_bound(entropies[i] + entropies[start], n, metric) <= threshold():
+                break
+            seconds = guesses[start : start + block]
+            bounds = np.array([score_bound(entropies[i] + e, n, metric) for e in entropies[start : start + block]])
+            seconds = seconds[bounds > threshold()]
+            scores = pair_scores(matrix, guesses[i], seconds, answers, metric)
+            scored += len(seconds)
+            for score, second in zip(scores.tolist(), seconds.tolist()):
+                item = (score, -int(min(guesses[i], second)), -int(max(guesses[i], second)))
+                if len(best) < top:
+                    heapq.heappush(best, item)
+                elif item > best[0]:
+                    heapq.heapreplace(best, item)
+    ranked = sorted(best, reverse=True)
+    return [(score, -first, -second) for score, first, second in ranked], scored
+
+
+def best_second_guesses(matrix, first, guesses, answers):
+    """
+    Return the best second guess for each feedback the first guess can get over the answers,
+    as {feedback code: guess index}. The best guess splits the answers left most evenly
+    (highest entropy), preferring guesses that could be the answer, then the lowest index.
+    """
+    guesses = np.asarray(guesses, dtype=np.int64)
+    answers = np.asarray(answers, dtype=np.int64)
+    first_codes = matrix.row_at(first)[answers]
+    seconds = {}
+    for code in np.unique(first_codes).tolist():
+        bucket = answers[first_codes == code]
+        if len(bucket) <= 2:
+            seconds[code] = int(bucket.min())
+            continue
+        entropies = guess_entropies(matrix, guesses, bucket)
+        possible = np.isin(guesses, bucket)
+        # lexsort sorts by the last key first
+        best = np.lexsort((guesses, ~possible, -np.round(entropies, 10)))[0]
+        seconds[code] = int(guesses[best])
+    return seconds
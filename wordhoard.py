@@ -2,10 +2,14 @@ import os
 import random
 import sys
 from collections import Counter
-from functools import lru_cache
+from functools import cached_property, lru_cache
 from typing import OrderedDict
 
+import numpy as np
+
+from feedback import FEEDBACK_BUDGET, MAX_MATRIX_WORDS, TiledFeedbackMatrix, cache_key, cached_feedback_matrix
 from globals import FREQ_FILE
+from lexicon import LEXICON_SUFFIX, Lexicon, compiled_lexicon, load_lexicon
 
 
 def split_line(line):
@@ -16,17 +20,95 @@ def split_line(line):
         return parts[0], int(parts[1])
 
 
+def by_count(counts):
+    """Return letter counts as an OrderedDict, most frequent first, ties reverse alphabetically
+    >>> list(by_count({"a": 1, "b": 2, "c": 1}).items())
+    [('b', 2), ('c', 1), ('a', 1)]
+    """
+    return OrderedDict([(l, k) for k, l in sorted([(j, i) for i, j in counts.items()], reverse=True)])
+
+
+def read_frequencies(file):
+    """Read a file of words and frequencies, return a dict of words and frequencies"""
+    with open(file) as f:
+        return dict([split_line(line) for line in f])
+
+
 class WordHoard:
-    def __init__(self, file=FREQ_FILE):
+    def __init__(self, file=FREQ_FILE, feedback_budget=None):
+        """
+        Load a word list: a compiled lexicon (see script/compile_lexicon.py) if given one, or if
+        there is an up-to-date one next to the word file, and otherwise the word file itself.
+        The dict and set views of the words are only built if they are used.
+        feedback_budget: bytes of feedback rows to keep for word lists too big for a dense matrix
+        """
         if file is None:
             file = FREQ_FILE
-        self.frequencies = self.read_words_and_frequencies(file)
-        self.words = set(self.frequencies.keys())
+        self.file = file
+        self.feedback_budget = feedback_budget or FEEDBACK_BUDGET
+        self._feedback_matrix = None
+        self._lexicon = load_lexicon(file) if file.endswith(LEXICON_SUFFIX) else compiled_lexicon(file)
+        if self._lexicon is None:
+            self._lexicon = Lexicon.from_frequencies(self.read_words_and_frequencies(file))
 
     def read_words_and_frequencies(self, file):
         """Read a file of words and frequencies, return a dict of words and frequencies"""
+        return read_frequencies(file)
+
+    def lexicon(self):
+        """Return the precomputed, shared view of the words every game uses
+        >>> wh = WordHoard(FREQ_FILE)
+        >>> wh.lexicon().size
+        5
+        >>> wh.lexicon() is wh.lexicon()
+        True
+        """
+        return self._lexicon
+
+    @cached_property
+    def frequencies(self):
+        """The words and their frequencies, as a dict"""
+        lexicon = self._lexicon
+        return dict(zip(lexicon.words, lexicon.frequencies.tolist()))
+
+    @property
+    def words(self):
+        return self._lexicon.word_set
+
+    @cached_property
+    def word_list(self):
+        """A fixed order for the words, so they can be referred to by index"""
+        return list(self._lexicon.words)
 
-        return dict([split_line(line) for line in open(file)])
+    @property
+    def word_index(self):
+        return self._lexicon.index
+
+    @cached_property
+    def key(self):
+        """A digest of the words, naming the word list in caches that outlive the process"""
+        return cache_key(self.word_list).hex()
+
+    def feedback_matrix(self):
+        """Return the guess x answer feedback matrix over the words, loading it from the
+        cache next to the word file, or building it, on first use. Word lists too big for
+        that get a TiledFeedbackMatrix, computing rows as they are needed within the
+        feedback budget. None if the words are not all the same size.
+        >>> wh = WordHoard(FREQ_FILE)
+        >>> m = wh.feedback_matrix()
+        >>> m.feedback("blood", "knoll")
+        '·yg··'
+        >>> m.words == wh.word_list
+        True
+        """
+        if self._feedback_matrix is None:
+            if self.lexicon().size is None:
+                return None
+            if len(self.word_list) > MAX_MATRIX_WORDS:
+                self._feedback_matrix = TiledFeedbackMatrix(self.word_list, self.feedback_budget)
+            else:
+                self._feedback_matrix = cached_feedback_matrix(self.word_list, self.file)
+        return self._feedback_matrix
 
     def frequency(self, word):
         """Return the frequency of a given word, 0 if not found"
@@ -50,16 +132,38 @@ class WordHoard:
         True
         >>> list(wh.letter_frequencies(["zzaudio"]).items())[0]
         ('z', 2)
+        >>> list(wh.letter_frequencies(["blood", "knoll"]).items())[0:2]
+        [('o', 3), ('l', 3)]
         """
+        return by_count(self.letter_counts(words))
+
+    def letter_counts(self, words):
+        """Return {letter: occurrences} over some words, counted over the letter matrix if they're all ours"""
+        lexicon = self.lexicon()
+        index = self.word_index
+        words = list(words)
+        if lexicon.size is not None and all(word in index for word in words):
+            counts = lexicon.letter_counts(np.array([index[word] for word in words], dtype=np.int64))
+            return {letter: count for letter, count in zip(lexicon.alphabet, counts.tolist()) if count}
         counter = Counter()
         for word in words:
             counter.update(list(word))
-        return OrderedDict(
-            [
-                (l, k)
-                for k, l in sorted([(j, i) for i, j in counter.items()], reverse=True)
-            ]
-        )
+        return counter
+
+    def position_frequencies(self, words):
+        """
+        Return, for each position, the letters there over some words and how often, most frequent first
+        >>> wh = WordHoard(FREQ_FILE)
+        >>> [list(counts.items()) for counts in wh.position_frequencies(["blood", "knoll", "radio"])][2]
+        [('o', 2), ('d', 1)]
+        """
+        lexicon = self.lexicon()
+        index = self.word_index
+        counts = lexicon.position_counts(np.array([index[word] for word in words if word in index], dtype=np.int64))
+        return [
+            by_count({letter: count for letter, count in zip(lexicon.alphabet, position.tolist()) if count})
+            for position in counts
+        ]
 
     def most_frequent_letters(self, words, n=6):
         """Return the most frequent letters in a set of words
@@ -70,42 +174,47 @@ class WordHoard:
         return list(self.letter_frequencies(words).keys())[0:n]
 
     def most_frequent_word(self, words):
-        """Return the most frequent words in a list of words
+        """Return the most frequent word in a list of words, ties going to the alphabetically first
         >>> wh = WordHoard(FREQ_FILE)
         >>> wh.most_frequent_word(["every", "audio", "ZZZZZ"])
         'every'
         """
-        return max(words, key=lambda word: self.frequencies.get(word, 0))
+        words = list(words)
+        index = self.word_index
+        known = [index[word] for word in words if word in index]
+        if not known:
+            return words[0]
+        ranks = self.lexicon().ranks
+        return self.word_list[min(known, key=ranks.__getitem__)]
 
     def most_frequent_words(self, n=10):
-        """Return the most frequent words in a list of words
+        """Return the n most frequent words, most frequent first
         >>> wh = WordHoard(FREQ_FILE)
-        >>> wh.most_frequent_words(["every", "audio", "ZZZZZ"], 2)
-        ['every', 'audio']
+        >>> wh.most_frequent_words(3)
+        ['which', 'their', 'would']
         """
-        return sorted(self.words, key=lambda word: self.frequencies.get(word, 0), reverse=True)[0:n]
+        return list(self.lexicon().top(n))
 
     def words_with_frequency(self, frequency=10000):
-        return [w for w, f in self.frequencies.items() if f >= frequency]
+        """Return the words at least this frequent, most frequent first
+        >>> wh = WordHoard(FREQ_FILE)
+        >>> wh.words_with_frequency(10**9)
+        ['which', 'their']
+        """
+        lexicon = self.lexicon()
+        return list(lexicon.top(lexicon.count_with_frequency(frequency)))
 
     def letter_frequencies_ignoring(self, words, letter_set):
         """
         Collect the letter frequencies of a set of words, ignoring the letters in letter_set
         >>> wh = WordHoard(FREQ_FILE)
-        >>> wh.letter_frequencies_ignoring(["zzaudio"], set(["z"]))
-        Counter({'a': 1, 'u': 1})
+        >>> list(wh.letter_frequencies_ignoring(["zzaudio"], set(["z"])).items())
+        [('u', 1), ('o', 1), ('i', 1), ('d', 1), ('a', 1)]
         """
-        counter = Counter()
-        for word in words:
-            counter.update(list(word))
+        counts = self.letter_counts(words)
         for l in letter_set:
-            counter.pop(l, None)
-        return OrderedDict(
-            [
-                (l, k)
-                for k, l in sorted([(j, i) for i, j in counter.items()], reverse=True)
-            ]
-        )
+            counts.pop(l, None)
+        return by_count(counts)
 
 
 @lru_cache(maxsize=None)
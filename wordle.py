@@ -1,8 +1,8 @@
 import os
 import random
 import sys
-from collections import Counter
 
+from feedback import decode_feedback, feedback_code
 from globals import FREQ_FILE, SOLUTION_FILE
 from wordhoard import WordHoard
 
@@ -29,7 +29,7 @@ class Wordle:
             self.wordhoard = wordhoard
         words = self.wordhoard.words
 
-        assert all(len(word) == size for word in words)
+        assert self.wordhoard.lexicon().size == size
         self.words = words
         if target:
             if target not in self.words:
@@ -62,25 +62,10 @@ class Wordle:
         >>> w.feedback('lulls', 'knoll')
         'y··g·'
         """
-        feedback = ["·"] * self.size
-        green_counts = Counter()
-        letter_counts = Counter(target)
-        yellow_counts = Counter()
-        # Do Green
-        for i in range(self.size):
-            if word[i] == target[i]:
-                feedback[i] = "g"
-                green_counts[word[i]] += 1
-        # Do yellow
-        for i in range(self.size):
-            if word[i] in target and word[i] != target[i]:
-                yellow_counts[word[i]] += 1
-                if (
-                    yellow_counts[word[i]] + green_counts[word[i]]
-                    <= letter_counts[word[i]]
-                ):
-                    feedback[i] = "y"
-        return "".join(feedback)
+        matrix = self.wordhoard.feedback_matrix()
+        if matrix is not None and word in matrix.index and target in matrix.index:
+            return matrix.feedback(word, target)
+        return decode_feedback(feedback_code(word, target), self.size)
 
     def matches_solution(self, word):
         """Return True if the word is solved, False otherwise
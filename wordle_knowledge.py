@@ -1,51 +1,180 @@
-# from collections import Counter
+import weakref
+
+import numpy as np
+
+from bitset import BitSet
+from feedback import letter_counts
+
+# Each lexicon's LetterIndex, built on first use and shared by every game over it
+_letter_indices = weakref.WeakKeyDictionary()
+
+
+def mask_bitset(mask):
+    """Return a boolean mask as a BitSet
+    >>> mask_bitset(np.array([True, False, True])).to_indices()
+    [0, 2]
+    """
+    packed = np.packbits(mask, bitorder="little")
+    return BitSet(len(mask), int.from_bytes(packed.tobytes(), "little"))
+
+
+class LetterIndex:
+    """
+    Inverted indices over a lexicon's words, as bitsets: the words with a letter at a
+    position, and the words with at least k of a letter
+    """
+
+    def __init__(self, lexicon):
+        self.size = lexicon.size
+        self.number_of_words = len(lexicon)
+        letters = lexicon.letters
+        counts = letter_counts(letters)
+        self.at = {}
+        self.at_least = {}
+        for number, letter in enumerate(lexicon.alphabet):
+            for position in range(self.size):
+                self.at[position, letter] = mask_bitset(letters[:, position] == number)
+            for k in range(1, self.size + 1):
+                self.at_least[letter, k] = mask_bitset(counts[:, number] >= k)
+
+    def none(self):
+        return BitSet(self.number_of_words)
+
+    def all(self):
+        return BitSet.full(self.number_of_words)
+
+    def with_letter_at(self, position, letter):
+        return self.at.get((position, letter)) or self.none()
+
+    def with_at_least(self, letter, k):
+        if k <= 0:
+            return self.all()
+        return self.at_least.get((letter, k)) or self.none()
+
+
+def letter_index(lexicon):
+    if lexicon not in _letter_indices:
+        _letter_indices[lexicon] = LetterIndex(lexicon)
+    return _letter_indices[lexicon]
 
 
 class WordleKnowledge:
-    def __init__(self, wordle, wordhoard):
-        self.letters = set()
-        for word in wordhoard.words:
-            for letter in word:
-                self.letters.add(letter)
-        self.letter_sets = [set(self.letters) for i in range(wordle.size)]
-        self.required_letters = set()
+    """
+    What the feedback so far says about the target: which letters can be at each position,
+    and how many of each letter it has (at least, and at most). Words in the word list are
+    checked against a bitset of the words still consistent, kept up to date with a few
+    bitset operations per guess.
+    >>> from wordle import Wordle
+    >>> wordle = Wordle(target="knoll")
+    >>> state = WordleKnowledge(wordle, wordle.wordhoard)
+    >>> state.update("lulls", "y··g·")
+    >>> state.min_counts["l"], state.max_counts["l"]
+    (2, 2)
+    >>> state.is_consistent("knoll"), state.is_consistent("atoll"), state.is_consistent("lolly")
+    (True, True, False)
+    >>> state.update("atoll", "··ggg")
+    >>> [word for word in ["knoll", "droll", "troll"] if state.is_consistent(word)]
+    ['knoll', 'droll']
+    >>> state.is_consistent("xnoll")  # not a word, so checked letter by letter
+    True
+    """
+
+    def __init__(self, wordle, wordhoard, size=None):
         self.wordle = wordle
         self.wordhoard = wordhoard
+        self.size = wordle.size if size is None else size
+        self.letters = set(wordhoard.lexicon().alphabet)
+        self.letter_sets = [set(self.letters) for i in range(self.size)]
+        self.required_letters = set()
+        self.min_counts = {}
+        self.max_counts = {}
+        lexicon = wordhoard.lexicon()
+        self.index = letter_index(lexicon) if lexicon.size == self.size else None
+        self.consistent = self.index.all() if self.index else None
+
+    @classmethod
+    def of_words(cls, wordhoard):
+        """Start knowing nothing about a target among the word hoard's words, with no game to go with it"""
+        return cls(None, wordhoard, wordhoard.lexicon().size)
+
+    def copy(self):
+        """Return a copy to update separately, sharing the letter index"""
+        result = WordleKnowledge.__new__(WordleKnowledge)
+        result.__dict__.update(self.__dict__)
+        result.letter_sets = [set(letter_set) for letter_set in self.letter_sets]
+        result.required_letters = set(self.required_letters)
+        result.min_counts = dict(self.min_counts)
+        result.max_counts = dict(self.max_counts)
+        result.consistent = self.consistent.copy() if self.consistent is not None else None
+        return result
 
     def is_consistent(self, word):
-        for i in range(self.wordle.size):
-            letter = word[i]
-            letter_set = self.letter_sets[i]
-            found = letter in letter_set
-            if not found:
+        index = self.wordhoard.word_index.get(word)
+        if index is not None and self.consistent is not None:
+            return self.consistent[index]
+        if len(word) != self.size:
+            return False
+        for i in range(self.size):
+            if word[i] not in self.letter_sets[i]:
+                return False
+        for letter, count in self.min_counts.items():
+            if word.count(letter) < count:
                 return False
-        return all(letter in word for letter in self.required_letters)
+        for letter, count in self.max_counts.items():
+            if word.count(letter) > count:
+                return False
+        return True
 
     def update_exact(self, letter, position):
         self.required_letters.add(letter)
         self.letter_sets[position] = set(letter)
+        if self.index:
+            self.consistent &= self.index.with_letter_at(position, letter)
 
     def update_required(self, letter, position):
-        self.required_letters.add(letter)
-        if letter in self.letter_sets[position]:
-            self.letter_sets[position].remove(letter)
+        """The letter is in the target, but not at this position (the same goes for a grey letter)"""
+        self.letter_sets[position].discard(letter)
+        if self.index:
+            self.consistent -= self.index.with_letter_at(position, letter)
+
+    def update_count(self, letter, marked, capped):
+        """
+        The target has at least as many of the letter as were marked green or yellow,
+        and if one was left grey, exactly that many
+        """
+        if marked > self.min_counts.get(letter, 0):
+            self.min_counts[letter] = marked
+            self.required_letters.add(letter)
+            if self.index:
+                self.consistent &= self.index.with_at_least(letter, marked)
+        if capped and marked < self.max_counts.get(letter, self.size + 1):
+            self.max_counts[letter] = marked
+            if marked == 0:
+                self.update_forbidden(letter)
+            if self.index:
+                self.consistent -= self.index.with_at_least(letter, marked + 1)
 
     def update_forbidden(self, letter):
         for letter_set in self.letter_sets:
-            if letter in letter_set and letter not in self.required_letters:
-                letter_set.remove(letter)
+            letter_set.discard(letter)
 
     def update(self, guess, feedback):
         """Update the knowledge of the wordle puzzle
         """
-        # print(f"[bold blue]{guess}[/bold blue]; {color_feedback(feedback, guess)}")
-        for i in range(self.wordle.size):
+        marked = {}
+        capped = set()
+        for i in range(self.size):
+            letter = guess[i]
             if feedback[i] == "g":
-                self.update_exact(guess[i], i)
-            elif feedback[i] == "y":
-                self.update_required(guess[i], i)
+                self.update_exact(letter, i)
+            else:
+                self.update_required(letter, i)
+            if feedback[i] in "gy":
+                marked[letter] = marked.get(letter, 0) + 1
             else:
-                self.update_forbidden(guess[i])
+                capped.add(letter)
+        for letter in set(guess):
+            self.update_count(letter, marked.get(letter, 0), letter in capped)
 
     def __repr__(self):
-        return f"{self.required_letters} {self.letter_sets}"
+        return f"{self.required_letters} {self.letter_sets} {self.min_counts} {self.max_counts}"
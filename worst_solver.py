@@ -4,8 +4,9 @@ import math
 import random
 from functools import cache
 
+from candidates import CandidateSet
+from feedback import feedback_code, guess_entropies
 from solver import Solver
-from wordle_knowledge import WordleKnowledge
 
 
 @cache
@@ -20,17 +21,28 @@ class WorstSolver(Solver):
     super().__init__(wordle, wordhoard, verbose)
     self.easy_mode = easy_mode
     self.top_n = top_n
-    # First, we limit our possible solutions to _common_ words
-    most_frequent = self.wordhoard.most_frequent_words(self.top_n)
-    self.possible_solutions_list = set(most_frequent)
+    self.reset(wordle)
 
-    self.state = WordleKnowledge(wordle, self.wordhoard)
+  def reset(self, wordle):
+    super().reset(wordle)
+    # First, we limit our possible solutions to _common_ words
+    self.candidates = CandidateSet.top(self.wordhoard, self.top_n)
 
   # guessing 'fishy' and the word is 'doggy' -> feedback '.....'
 
+  def feedback_codes(self, guess):
+    """Return the feedback codes of a guess against each possible solution, from the feedback matrix if we can"""
+    matrix = self.wordhoard.feedback_matrix()
+    if matrix is None or guess not in matrix:
+      return [feedback_code(guess, possible_solution) for possible_solution in self.candidates]
+    return matrix.row(guess)[self.solution_indices()].tolist()
+
+  def solution_indices(self):
+    """Return the feedback matrix indices of the possible solutions"""
+    return self.candidates.indices()
+
   def collect_wordgroups_by_feedback(self, guess):
-    word_feedbacks = [(possible_solution, self.wordle.feedback(guess, possible_solution)) for possible_solution in self.possible_solutions_list]
-    return itertools.groupby(word_feedbacks, lambda x: x[1])
+    return itertools.groupby(sorted(self.feedback_codes(guess)))
 
   def wordgroup_entropy(self, wordgroups):
     sizes = [len(list(g)) for _, g in wordgroups]
@@ -40,28 +52,41 @@ class WorstSolver(Solver):
   def guess_entropy(self, guess):
     return self.wordgroup_entropy(self.collect_wordgroups_by_feedback(guess))
 
+  def guess_entropies(self, guesses):
+    """Return the entropy of each guess, scoring them all in one batch if we have the feedback matrix"""
+    matrix = self.wordhoard.feedback_matrix()
+    if matrix is None or not all(guess in matrix for guess in guesses):
+      return [self.guess_entropy(guess) for guess in guesses]
+    return guess_entropies(matrix, matrix.indices(guesses), self.solution_indices()).tolist()
+
+  def ranked_guesses(self, guesses):
+    """Return (guess, entropy) pairs, lowest entropy first, ties going to the alphabetically first guess"""
+    entropies = self.guess_entropies(guesses)
+    # rounding so that equal partitions tie exactly, whatever order their sizes were summed in
+    return sorted(zip(guesses, entropies), key=lambda x: (round(x[1], 10), x[0]))
+
 
   def update(self, guess, feedback):
         """Update the knowledge of the wordle puzzle
         """
         # call the super method
         super().update(guess, feedback)
-        self.state.update(guess, feedback)
-        self.possible_solutions_list = [
-            word
-            for word in self.possible_solutions_list
-            if self.state.is_consistent(word) and word != guess
-        ]
+        self.candidates = self.candidates.after_feedback(guess, feedback).discard(guess)
 
   def possible_solutions(self):
-    return self.possible_solutions_list
+    return self.candidates.words()
+
+  def has_solutions(self):
+    return bool(self.candidates)
+
+  def number_of_solutions(self):
+    return len(self.candidates)
 
   def guess(self):
-      # return best by entropy
-      print("considering entropies...")
-      entropies = [self.guess_entropy(g) for g in self.possible_solutions_list]
-      zipped = zip(self.possible_solutions_list, entropies)
-      sorted_zipped = sorted(zipped, key=lambda x: x[1], reverse=False)
-      best_guess, best_entropy = sorted_zipped[0]
-      print(f"Best guess: {best_guess} with entropy {best_entropy}")
+      # return worst by entropy
+      if self.verbose:
+        print("considering entropies...")
+      best_guess, best_entropy = self.ranked_guesses(self.candidates.words())[0]
+      if self.verbose:
+        print(f"Best guess: {best_guess} with entropy {best_entropy}")
       return best_guess